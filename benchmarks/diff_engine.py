@@ -0,0 +1,167 @@
+"""Per-tick CPU time of diffing 10k configured records against the fetched provider records.
+
+Compares the previous per-tick loop (recomputing every AAAA address with the string based
+`calculateIPv6Address` and every record key) with the DiffEngine for an unchanged and a changed IPv6
+prefix. Run from the repository root:
+
+    python benchmarks/diff_engine.py
+"""
+
+import ipaddress
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from config import GlobalConfig, ZonesConfig
+from ip_fetching import IPv6Prefix, deriveIPv6Address, parseIPv6Suffix, parsePrefixOffset
+from providers.abstract import Record
+from providers.diff_engine import DiffEngine
+
+from ipv6_derivation import calculateIPv6Address
+
+ZONES = 10
+RECORDS_PER_ZONE = 1000  # half A, half AAAA
+TICKS = 20
+
+IPV4 = "203.0.113.7"
+PREFIX = (IPv6Prefix(0x20010DB812345600),)
+CHANGED_PREFIX = (IPv6Prefix(0x20010DB812345700),)
+
+
+def buildConfig() -> tuple[GlobalConfig, list[ZonesConfig]]:
+    globalConfig = GlobalConfig.model_validate(
+        {"logging": [], "disable-ipv6": False, "current_prefix_offset": "0"}
+    )
+    zones = [
+        ZonesConfig.model_validate(
+            {
+                "name": f"zone{zone}.tld",
+                "ipv4_records": [
+                    {"name": f"v4-{record}"} for record in range(RECORDS_PER_ZONE // 2)
+                ],
+                "ipv6_records": [
+                    {
+                        "name": f"v6-{record}",
+                        "prefixOffset": str(record % 16),
+                        "suffix": f"::{record:x}",
+                    }
+                    for record in range(RECORDS_PER_ZONE // 2)
+                ],
+            }
+        )
+        for zone in range(ZONES)
+    ]
+    return globalConfig, zones
+
+
+def fetchedRecords(
+    globalConfig: GlobalConfig, zones: list[ZonesConfig]
+) -> dict[str, dict[str, Record]]:
+    # provider state as fetched while the first prefix was active
+    records: dict[str, dict[str, Record]] = {}
+    for zone in zones:
+        records[zone.name] = {
+            f"A-{record.name}": Record(
+                ttl=globalConfig.ttl, name=record.name, value=IPV4, type="A"
+            )
+            for record in zone.ipv4_records
+        }
+        for record in zone.ipv6_records:
+            records[zone.name][f"AAAA-{record.name}"] = Record(
+                ttl=globalConfig.ttl,
+                name=record.name,
+                value=deriveIPv6Address(
+                    PREFIX[0],
+                    parsePrefixOffset(record.prefixOffset),
+                    parseIPv6Suffix(record.suffix),
+                ),
+                type="AAAA",
+            )
+    return records
+
+
+def previousTick(
+    globalConfig: GlobalConfig,
+    zones: list[ZonesConfig],
+    records: dict[str, dict[str, Record]],
+    prefix: tuple[IPv6Prefix, ...],
+) -> int:
+    # the per-tick loop before the diff engine: recompute and compare every configured record
+    # the prefix was passed around as the groups of the discovered address
+    prefixGroups = ipaddress.IPv6Address(prefix[0].network << 64).exploded.split(":")
+    changes = 0
+    for zone in zones:
+        current = records[zone.name]
+        for record in zone.ipv4_records:
+            existing = current.get(f"A-{record.name}")
+            if existing is None or existing.value != IPV4 or existing.ttl != globalConfig.ttl:
+                changes += 1
+        for record in zone.ipv6_records:
+            value = calculateIPv6Address(prefixGroups, record.prefixOffset, record.suffix)
+            existing = current.get(f"AAAA-{record.name}")
+            if existing is None or existing.value != value or existing.ttl != globalConfig.ttl:
+                changes += 1
+    return changes
+
+
+def diffEngineTick(
+    engine: DiffEngine,
+    zones: list[ZonesConfig],
+    records: dict[str, dict[str, Record]],
+    prefix: tuple[IPv6Prefix, ...],
+) -> int:
+    changes = 0
+    for zone in zones:
+        changes += len(
+            engine.diff(
+                zoneName=zone.name,
+                currentIPv4=IPV4,
+                currentIPv6Prefixes=prefix,
+                currentRecords=records[zone.name],
+                recordState=lambda record: ((record.value,), record.ttl),
+            )
+        )
+    return changes
+
+
+def measure(name: str, tick, prefixes: list[tuple[IPv6Prefix, ...]]):
+    changes = 0
+    start = time.process_time()
+    for i in range(TICKS):
+        changes = tick(prefixes[i % len(prefixes)])
+    perTick = (time.process_time() - start) / TICKS * 1000
+    print(f"{name:<40} {perTick:8.2f} ms CPU per tick ({changes} changes)")
+
+
+def main():
+    globalConfig, zones = buildConfig()
+    records = fetchedRecords(globalConfig, zones)
+    engine = DiffEngine(zones, globalConfig)
+    print(f"{ZONES * RECORDS_PER_ZONE} configured records, {TICKS} ticks\n")
+
+    measure(
+        "previous loop, unchanged prefix",
+        lambda prefix: previousTick(globalConfig, zones, records, prefix),
+        [PREFIX],
+    )
+    measure(
+        "diff engine, unchanged prefix",
+        lambda prefix: diffEngineTick(engine, zones, records, prefix),
+        [PREFIX],
+    )
+    measure(
+        "previous loop, prefix changes every tick",
+        lambda prefix: previousTick(globalConfig, zones, records, prefix),
+        [PREFIX, CHANGED_PREFIX],
+    )
+    measure(
+        "diff engine, prefix changes every tick",
+        lambda prefix: diffEngineTick(engine, zones, records, prefix),
+        [PREFIX, CHANGED_PREFIX],
+    )
+
+
+if __name__ == "__main__":
+    main()
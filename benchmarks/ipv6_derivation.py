@@ -0,0 +1,104 @@
+"""Micro-benchmark of deriving AAAA record addresses from the delegated IPv6 prefix.
+
+Compares the previous string based `calculateIPv6Address` with the integer based `deriveIPv6Address`,
+with and without its memoization, and deriving the addresses of several active prefixes one prefix at a
+time with `deriveIPv6Addresses`, which handles all prefixes of a record in one pass. Run from the
+repository root:
+
+    python benchmarks/ipv6_derivation.py
+"""
+
+import ipaddress
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from ip_fetching import (
+    IPv6Prefix,
+    deriveIPv6Address,
+    deriveIPv6Addresses,
+    deriveIPv6Prefix,
+    parseIPv6Suffix,
+    parsePrefixOffset,
+)
+
+RECORDS = 1000
+REPEAT = 20
+# one delegated /56 per uplink
+UPLINK_ADDRESSES = ["2001:db8:1234:5600::1", "2001:db8:abcd:ef00::1", "2a01:4f8:42:1700::1"]
+
+
+def calculateIPv6Address(
+    prefix: list[str], prefixOffset: str, currentAddressOrFixedSuffix: str
+) -> str:
+    # string based derivation as used before, kept for comparison
+    prefix_int = int("".join(prefix[:4]), 16)
+    prefix_id_int = int(prefixOffset, 10)
+    if f"{(prefix_int + prefix_id_int):016x}".__len__() > 16:
+        raise ValueError("overflowing prefix")
+    new_prefix = f"{(prefix_int + prefix_id_int) & 0xFFFFFFFFFFFFFFFF:016x}"
+    return ipaddress.IPv6Address(
+        ":".join(new_prefix[i : i + 4] for i in range(0, len(new_prefix), 4))
+        + ":"
+        + ":".join(
+            ipaddress.IPv6Address(currentAddressOrFixedSuffix).exploded.split(sep=":")[
+                -4:
+            ]
+        )
+    ).compressed
+
+
+def main():
+    address = "2001:db8:1234:5600::1"
+    prefixGroups = ipaddress.IPv6Address(address).exploded.split(":")
+    prefix = IPv6Prefix(int(ipaddress.IPv6Address(address)) >> 64)
+    prefixes = tuple(deriveIPv6Prefix(uplink, 0, 56) for uplink in UPLINK_ADDRESSES)
+    records = [(str(i % 16), f"::{i:x}") for i in range(RECORDS)]
+    parsedRecords = [
+        (parsePrefixOffset(offset), parseIPv6Suffix(suffix)) for offset, suffix in records
+    ]
+
+    for (offset, suffix), (parsedOffset, parsedSuffix) in zip(records, parsedRecords):
+        assert calculateIPv6Address(prefixGroups, offset, suffix) == deriveIPv6Address(
+            prefix, parsedOffset, parsedSuffix
+        )
+
+    def previous():
+        for offset, suffix in records:
+            calculateIPv6Address(prefixGroups, offset, suffix)
+
+    def integer():
+        deriveIPv6Address.cache_clear()
+        for offset, suffix in parsedRecords:
+            deriveIPv6Address(prefix, offset, suffix)
+
+    def memoized():
+        for offset, suffix in parsedRecords:
+            deriveIPv6Address(prefix, offset, suffix)
+
+    def perPrefix():
+        deriveIPv6Address.cache_clear()
+        for offset, suffix in parsedRecords:
+            tuple(sorted(deriveIPv6Address(p, offset, suffix) for p in prefixes))
+
+    def allPrefixes():
+        deriveIPv6Addresses.cache_clear()
+        for offset, suffix in parsedRecords:
+            deriveIPv6Addresses(prefixes, offset, suffix)
+
+    print(f"{RECORDS} AAAA records, best of {REPEAT} runs\n")
+    for name, run in [
+        ("previous string based", previous),
+        ("integer based", integer),
+        ("integer based, memoized", memoized),
+        (f"{len(prefixes)} prefixes, one at a time", perPrefix),
+        (f"{len(prefixes)} prefixes, one pass", allPrefixes),
+    ]:
+        best = min(timeit.repeat(run, number=1, repeat=REPEAT))
+        print(f"{name:<30} {best / RECORDS * 1e6:8.3f} µs per record")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Micro-benchmark of parsing large record and zone listings of the Hetzner APIs.
+
+Compares decoding the response body into dicts with `json()` and validating them afterwards, as used
+before, with validating the raw body with `model_validate_json`, and validating the zone listings into
+the projections which only keep the zone id and name. Record listings are also decoded while streaming
+the body in chunks, validating only the records of 10 configured names. Uses a synthetic page of 50k
+records, mostly of types which are not managed, and a page of 1000 zones. Run from the repository root:
+
+    python benchmarks/record_parsing.py
+"""
+
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from providers.json_stream import CHUNK_SIZE, JSONArrayStream
+from providers.hetzner.api_pydantic_models import (
+    HetznerRecords,
+    HetznerZones,
+    HetznerZoneSummaries,
+)
+from providers.hetzner_cloud.api_pydantic_models import (
+    HetznerCloudRecords,
+    HetznerCloudZones,
+    HetznerCloudZoneSummaries,
+)
+
+RECORDS = 50_000
+ZONES = 1000
+CONFIGURED = {f"{type}-host{i}" for i in range(10) for type in ("A", "AAAA")}
+REPEAT = 5
+TYPES = ["A", "AAAA", "CNAME", "MX", "TXT", "TXT", "TXT", "SRV", "CAA", "NS"]
+VALUES = {
+    "A": "198.51.100.7",
+    "AAAA": "2001:db8:1234:5600::7",
+    "CNAME": "target.example.com.",
+    "MX": "10 mail.example.com.",
+    "TXT": '"v=spf1 include:_spf.example.com ~all"',
+    "SRV": "10 5 5060 sip.example.com.",
+    "CAA": '0 issue "letsencrypt.org"',
+    "NS": "hydrogen.ns.hetzner.com.",
+}
+
+
+def pagination(entries: int) -> dict[str, Any]:
+    return {
+        "page": 1,
+        "per_page": entries,
+        "previous_page": None,
+        "next_page": None,
+        "last_page": 1,
+        "total_entries": entries,
+    }
+
+
+def hetznerRecords() -> bytes:
+    records = []
+    for i in range(RECORDS):
+        recordType = TYPES[i % len(TYPES)]
+        records.append(
+            {
+                "id": f"{i:032x}",
+                "type": recordType,
+                "name": f"host{i}",
+                "value": VALUES[recordType],
+                "ttl": 3600,
+                "zone_id": f"{i % ZONES:022x}",
+                "created": "2025-01-01 00:00:00 +0000 UTC",
+                "modified": "2025-01-01 00:00:00 +0000 UTC",
+            }
+        )
+    return json.dumps({"records": records, "meta": {"pagination": pagination(RECORDS)}}).encode()
+
+
+def hetznerZones() -> bytes:
+    zones = []
+    for i in range(ZONES):
+        zones.append(
+            {
+                "id": f"{i:022x}",
+                "created": "2025-01-01 00:00:00 +0000 UTC",
+                "modified": "2025-01-01 00:00:00 +0000 UTC",
+                "legacy_dns_host": "",
+                "legacy_ns": [],
+                "name": f"zone{i}.example",
+                "ns": ["hydrogen.ns.hetzner.com", "oxygen.ns.hetzner.com", "helium.ns.hetzner.de"],
+                "owner": "",
+                "paused": False,
+                "permission": "",
+                "project": "",
+                "registrar": "",
+                "status": "verified",
+                "ttl": 86400,
+                "verified": "",
+                "records_count": RECORDS // ZONES,
+                "is_secondary_dns": False,
+                "txt_verification": {"name": "", "token": ""},
+            }
+        )
+    return json.dumps({"zones": zones, "meta": {"pagination": pagination(ZONES)}}).encode()
+
+
+def hetznerCloudRecords() -> bytes:
+    rrsets = []
+    for i in range(RECORDS):
+        recordType = TYPES[i % len(TYPES)]
+        rrsets.append(
+            {
+                "id": f"host{i}/{recordType}",
+                "name": f"host{i}",
+                "type": recordType,
+                "ttl": 3600,
+                "labels": {},
+                "protection": {"change": False},
+                "records": [{"value": VALUES[recordType], "comment": None}],
+                "zone": i % ZONES,
+            }
+        )
+    return json.dumps({"rrsets": rrsets, "meta": {"pagination": pagination(RECORDS)}}).encode()
+
+
+def hetznerCloudZones() -> bytes:
+    zones = []
+    for i in range(ZONES):
+        zones.append(
+            {
+                "id": i,
+                "name": f"zone{i}.example",
+                "created": "2025-01-01T00:00:00Z",
+                "mode": "primary",
+                "labels": {},
+                "protection": {"delete": False},
+                "ttl": 3600,
+                "status": "ok",
+                "record_count": RECORDS // ZONES,
+                "authoritative_nameservers": {
+                    "assigned": ["hydrogen.ns.hetzner.com.", "oxygen.ns.hetzner.com."],
+                    "delegated": ["hydrogen.ns.hetzner.com.", "oxygen.ns.hetzner.com."],
+                    "delegation_last_check": None,
+                    "delegation_status": "valid",
+                },
+                "registrar": "other",
+            }
+        )
+    return json.dumps({"zones": zones, "meta": {"pagination": pagination(ZONES)}}).encode()
+
+
+def streamed(body: bytes, arrayKey: str, model: Any) -> Any:
+    stream = JSONArrayStream(arrayKey)
+    items: list[Any] = []
+    for i in range(0, len(body) + 1, CHUNK_SIZE):
+        for item in stream.feed(body[i : i + CHUNK_SIZE], final=i + CHUNK_SIZE > len(body)):
+            if f"{item["type"]}-{item["name"]}" in CONFIGURED:
+                items.append(item)
+    return model.model_validate({**stream.fields, arrayKey: items})
+
+
+def peakMemory(run: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    for name, body, entries, previous, current, arrayKey in [
+        ("hetzner records", hetznerRecords(), RECORDS, HetznerRecords, HetznerRecords, "records"),
+        ("hetzner zones", hetznerZones(), ZONES, HetznerZones, HetznerZoneSummaries, None),
+        ("hetzner-cloud rrsets", hetznerCloudRecords(), RECORDS, HetznerCloudRecords, HetznerCloudRecords, "rrsets"),
+        ("hetzner-cloud zones", hetznerCloudZones(), ZONES, HetznerCloudZones, HetznerCloudZoneSummaries, None),
+    ]:
+        print(f"{name}: {entries} entries, {len(body) / 1e6:.1f} MB body")
+        runs: list[tuple[str, Callable[[], Any]]] = [
+            ("json() + model_validate", lambda body=body, model=previous: model.model_validate(json.loads(body))),
+            ("model_validate_json", lambda body=body, model=previous: model.model_validate_json(body)),
+        ]
+        if current is not previous:
+            runs.append(
+                ("projection, model_validate_json", lambda body=body, model=current: model.model_validate_json(body))
+            )
+        if arrayKey is not None:
+            runs.append(
+                ("streamed, configured records only", lambda body=body, key=arrayKey, model=previous: streamed(body, key, model))
+            )
+        for runName, run in runs:
+            best = min(timeit.repeat(run, number=1, repeat=REPEAT))
+            print(
+                f"  {runName:<33} {best * 1e3:8.1f} ms {best / entries * 1e6:7.2f} µs per entry"
+                f" {peakMemory(run) / 1e6:7.1f} MB peak"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
+import ipaddress
+
 from pydantic import BaseModel, Field, model_validator
-from typing import Any, TypeVar, Generic
+from typing import Any, TypeVar, Generic, Literal
 
 ProviderConfigConfig = TypeVar('ProviderConfigConfig')
 
@@ -8,6 +10,77 @@ class LoggingConfig(BaseModel):
   loglevel: str
   provider_config: Any | None = None
 
+class IPSourceConfig(BaseModel):
+  source: str
+  name: str | None = None # used in logs and source statistics, derived from the source config if unset
+  timeout: float = 5
+  source_config: Any | None = None
+
+class IPSourcesConfig(BaseModel):
+  mode: Literal["race", "quorum"] = "race" # race: first valid answer wins, quorum: `quorum` sources have to agree
+  quorum: int = 2
+  fanout: int | None = 2 # race mode queries the `fanout` best scored sources, the others only if none of them answers, all at once if unset
+  sources: list[IPSourceConfig]
+
+  @model_validator(mode="after")
+  def check_quorum(self):
+      if self.mode == "quorum" and self.quorum > len(self.sources):
+          raise ValueError("`quorum` can not be larger than the amount of configured `sources`")
+      return self
+
+class WatchConfig(BaseModel):
+  mode: Literal["netlink", "poll"] = "netlink" # netlink: kernel address notifications, poll: query the ip sources every `poll_interval`
+  poll_interval: float = 5 # seconds, only local sources like `interface` are polled at this rate
+  remote_poll_interval: float = 300 # seconds, used instead if an address has no local source to poll
+  debounce: float = 2 # seconds to wait for further changes before triggering an update
+
+class RateLimitConfig(BaseModel):
+  requests_per_second: float = 10 # upper bound, lowered automatically from the RateLimit-* response headers
+  burst: int = 10
+  max_concurrent_requests: int = 10
+  default_retry_after: float = 5 # seconds to pause after a 429 response without Retry-After header
+  max_retries: int = 3 # resend a request rejected with 429 this often
+
+class RetryConfig(BaseModel):
+  max_attempts: int = 4 # including the first try, 1 disables retries
+  base_delay: float = 0.5 # seconds, doubled for every further attempt
+  max_delay: float = 10 # seconds
+  deadline: float | None = None # seconds after the start of a run to stop retrying, defaults to the time until the next cron run
+
+class CircuitBreakerConfig(BaseModel):
+  enabled: bool = True
+  failure_threshold: int = 3 # consecutive failed runs before API calls are paused
+  cooldown: float = 120 # seconds to pause API calls before probing the provider again
+  max_cooldown: float = 900 # the cooldown doubles with every failed probe up to this many seconds
+
+class HttpConfig(BaseModel):
+  pool_size: int = 100 # connections per host session
+  pool_size_per_host: int = 10 # connections to the same endpoint, 0 for no limit
+  keepalive_timeout: float = 75 # seconds to keep idle connections open for reuse
+  dns_cache_ttl: int = 300 # seconds to cache resolved hostnames, the api hosts rarely change their addresses
+  use_aiodns: bool = True # resolve hostnames asynchronously through aiodns instead of a thread pool
+  conditional_requests: bool = True # revalidate zone and record listings fetched before instead of downloading them again
+
+def defaultIPSources(url: str) -> IPSourcesConfig:
+  return IPSourcesConfig(sources=[IPSourceConfig(source="http", source_config={"url": url})])
+
+class IPv6PrefixConfig(BaseModel):
+  name: str | None = None # used in logs
+  sources: IPSourcesConfig = Field(default_factory=lambda: defaultIPSources("https://api6.ipify.org"))
+  prefix_length: int | None = None # length of the delegated prefix, e.g. 56 or 48, record offsets are subnet ids within it
+  current_prefix_offset: str | None = None # subnet id of the network the sources see, not required if `prefix_length` is set
+  withdraw_after: int | None = None # failed discoveries after which the addresses of this prefix are removed from the records, never if unset
+
+  @model_validator(mode="after")
+  def check_prefix(self):
+      if self.prefix_length is None and self.current_prefix_offset is None:
+          raise ValueError("`current_prefix_offset` or `prefix_length` is required for every IPv6 prefix")
+      if self.prefix_length is not None and not 0 <= self.prefix_length <= 64:
+          raise ValueError("`prefix_length` has to be between 0 and 64")
+      if self.withdraw_after is not None and self.withdraw_after < 1:
+          raise ValueError("`withdraw_after` has to be at least 1")
+      return self
+
 class GlobalConfig(BaseModel):
   cron: str = "*/1 * * * *"
   ttl: int = 60
@@ -18,14 +91,38 @@ class GlobalConfig(BaseModel):
   python_root_logger: bool = Field(False, alias="python-root-logger") # toggle this to true to listen to the logging root logger instead of DNS Updater only
   allowed_consecutive_ip_fetch_timeouts: int = 0 # by default 0 consecutive fails are allowed before firing alert
   allowed_consecutive_provider_timeouts: int = 0
+  state_file: str | None = None # persist the last applied state to this file, kept in memory only if unset
+  full_reconcile_interval: int = 0 # seconds between full provider fetches while the IP is unchanged, 0 disables skipping
+  zone_id_cache_ttl: int = 0 # seconds to reuse resolved zone ids instead of listing zones every tick, 0 disables caching
+  ipv4_sources: IPSourcesConfig = Field(default_factory=lambda: defaultIPSources("https://api.ipify.org"))
+  ipv6_sources: IPSourcesConfig = Field(default_factory=lambda: defaultIPSources("https://api6.ipify.org"))
+  ipv6_prefix_length: int | None = None # length of the delegated prefix, e.g. 56 or 48, unset keeps adding offsets to the upper 64 bits
+  ipv6_prefixes: list[IPv6PrefixConfig] | None = None # multiple delegated prefixes, e.g. one per uplink, replaces `ipv6_sources`, `ipv6_prefix_length` and `current_prefix_offset`
+  http: HttpConfig = Field(default_factory=HttpConfig) # connection pooling of the provider api and ip source requests
+  watch: WatchConfig | None = None # trigger updates on address changes, cron only acts as safety-net reconcile
+  alert_repeat_window: float = 3600 # seconds to collapse a repeated error into one "repeated N times" entry, 0 logs every repetition
   logging: list[LoggingConfig]
 
   @model_validator(mode="after")
   def check_ipv6_requirement(self):
-      if not self.disable_v6 and self.current_prefix_offset is None:
-          raise ValueError("`current_prefix_offset` is required when IPv6 is enabled (disable-ipv6 == False)")
+      if not self.disable_v6 and self.ipv6_prefixes is None and self.current_prefix_offset is None and self.ipv6_prefix_length is None:
+          raise ValueError("`current_prefix_offset` or `ipv6_prefix_length` is required when IPv6 is enabled (disable-ipv6 == False)")
+      if self.ipv6_prefix_length is not None and not 0 <= self.ipv6_prefix_length <= 64:
+          raise ValueError("`ipv6_prefix_length` has to be between 0 and 64")
+      if self.ipv6_prefixes is not None and len(self.ipv6_prefixes) == 0:
+          raise ValueError("`ipv6_prefixes` needs at least one prefix")
       return self
 
+  def ipv6PrefixConfigs(self) -> list[IPv6PrefixConfig]:
+      if self.ipv6_prefixes is not None:
+          return self.ipv6_prefixes
+      # single prefix configured through the global options
+      return [IPv6PrefixConfig(
+          sources=self.ipv6_sources,
+          prefix_length=self.ipv6_prefix_length,
+          current_prefix_offset=self.current_prefix_offset,
+      )]
+
 class RecordConfigV4(BaseModel):
   name: str
 
@@ -34,6 +131,13 @@ class RecordConfigV6(BaseModel):
   prefixOffset: str
   suffix: str
 
+  @model_validator(mode="after")
+  def check_address_parts(self):
+      # parsed once into integers when the provider is initialised, reject invalid values at config load
+      int(self.prefixOffset, 10)
+      ipaddress.IPv6Address(self.suffix)
+      return self
+
 class ZonesConfig(BaseModel):
   name: str
   ipv4_records: list[RecordConfigV4]
@@ -42,6 +146,12 @@ class ZonesConfig(BaseModel):
 class ProviderConfig(BaseModel, Generic[ProviderConfigConfig]):
   provider: str
   allowed_consecutive_timeouts: int | None = None
+  cron: str | None = None # run this provider on its own schedule, defaults to the global cron
+  fetch_mode: Literal["auto", "targeted", "bulk"] = "auto" # targeted: only query configured zones and record types, bulk: list the whole account
+  zone_concurrency: int = 5 # zones fetched and updated at the same time in targeted mode
+  rate_limit: RateLimitConfig = Field(default_factory=RateLimitConfig)
+  retry: RetryConfig = Field(default_factory=RetryConfig)
+  circuit_breaker: CircuitBreakerConfig = Field(default_factory=CircuitBreakerConfig)
   provider_config: ProviderConfigConfig
   zones: list[ZonesConfig]
 
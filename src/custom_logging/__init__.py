@@ -1,2 +1,4 @@
 from .providers import *
-from .logger import Logger
\ No newline at end of file
+from .logger import Logger
+from .aggregation import AlertAggregationFilter
+from .lazy import LazyJSON
@@ -0,0 +1,86 @@
+import logging
+import time
+
+
+class ActiveAlert(object):
+    since: float  # monotonic time of the first occurrence
+    lastEmitted: float
+    occurrences: int
+    suppressed: int  # occurrences since the last emitted entry
+
+    def __init__(self, now: float):
+        self.since = now
+        self.lastEmitted = now
+        self.occurrences = 1
+        self.suppressed = 0
+
+
+def formatDuration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours > 0:
+        return f"{hours}h {minutes}m"
+    if minutes > 0:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+
+class AlertAggregationFilter(logging.Filter):
+    """Collapses repeated alerts into one entry per window and reports their resolution.
+
+    Records logged with `extra={"alert": key}` pass the first time, repetitions of the same key within
+    `window` seconds are dropped and counted, the first repetition after the window passes with a
+    "repeated N times" note. A record logged with `extra={"resolves": key}` only passes if the alert is
+    active, noting how long it lasted, so recoveries are reported once and never on healthy runs.
+    A `window` of 0 or less passes every alert, active alerts are still tracked for their recovery."""
+
+    window: float
+    alerts: dict[str, ActiveAlert]
+
+    def __init__(self, window: float):
+        super().__init__()
+        self.window = window
+        self.alerts = {}
+
+    @staticmethod
+    def __amend(record: logging.LogRecord, note: str):
+        record.msg = f"{record.getMessage()}\n({note})"
+        record.args = None
+
+    def __alert(self, key: str, record: logging.LogRecord) -> bool:
+        now = time.monotonic()
+        alert = self.alerts.get(key)
+        if alert is None:
+            self.alerts[key] = ActiveAlert(now)
+            return True
+        alert.occurrences += 1
+        if self.window > 0 and now - alert.lastEmitted < self.window:
+            alert.suppressed += 1
+            return False
+        if alert.suppressed > 0:
+            self.__amend(
+                record,
+                f"repeated {alert.suppressed} time(s) in the last {formatDuration(now - alert.lastEmitted)}",
+            )
+        alert.lastEmitted = now
+        alert.suppressed = 0
+        return True
+
+    def __resolve(self, key: str, record: logging.LogRecord) -> bool:
+        alert = self.alerts.pop(key, None)
+        if alert is None:
+            return False
+        self.__amend(
+            record,
+            f"after {alert.occurrences} failure(s) within {formatDuration(time.monotonic() - alert.since)}",
+        )
+        return True
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "alert", None)
+        if key is not None:
+            return self.__alert(key, record)
+        key = getattr(record, "resolves", None)
+        if key is not None:
+            return self.__resolve(key, record)
+        return True
@@ -2,10 +2,18 @@
 Inspired by / based on python-logging-discord-handler"""
 
 import logging
+import queue
 import sys
+import threading
+import time
 from requests import Response
 from discord_webhook import DiscordEmbed, DiscordWebhook
-from typing import Optional, List
+from typing import NamedTuple, Optional, List
+
+# limits of a single webhook message, see https://discord.com/developers/docs/resources/message#embed-object-embed-limits
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_CHARS_PER_MESSAGE = 6000
+MAX_DESCRIPTION_CHARS = 4096
 
 
 DEFAULT_COLOURS = {
@@ -29,12 +37,28 @@ DEFAULT_EMOJIS = {
 }
 
 
+class QueuedEmbed(NamedTuple):
+    title: str
+    description: str
+    colour: int
+
+    def length(self) -> int:
+        # characters counted towards the message limit
+        return len(self.title) + len(self.description)
+
+
 class DiscordHandler(logging.Handler):
     """Output logs to Discord chat.
 
     A handler class which writes logging records, appropriately formatted,
     to a Discord Server using webhooks.
 
+    `emit` only formats the record and puts it on a bounded queue, a background thread delivers the
+    queued records, coalescing everything that arrives within `batch_interval` into one webhook message
+    of up to 10 embeds and 6000 characters. Webhook round trips and rate limit waits therefore never block
+    the logging caller. If the queue is full, new records are dropped (or the oldest ones with
+    `drop_oldest`) and a notice about the dropped records is delivered with the next message, or on close.
+
     Inspired by / based on [python-logging-discord-handler](https://pypi.org/project/python-logging-discord-handler/).
     """
 
@@ -49,6 +73,9 @@ class DiscordHandler(logging.Handler):
         embed_line_wrap_threshold: int = 60,
         message_break_char: Optional[str] = None,
         discord_timeout: float = 5.0,
+        queue_size: int = 1000,
+        batch_interval: float = 2.0,
+        drop_oldest: bool = False,
     ):
         """
 
@@ -69,6 +96,10 @@ class DiscordHandler(logging.Handler):
             messages to overcome the 2000 character limitation.
         :param discord_timeout:
             How many seconds to wait before giving up on Discord request.
+        :param queue_size: How many log entries may wait for delivery.
+        :param batch_interval:
+            How many seconds to wait for further log entries to send along with the first one.
+        :param drop_oldest: Drop the oldest instead of the newest log entries if the queue is full.
         """
 
         logging.Handler.__init__(self)
@@ -78,10 +109,22 @@ class DiscordHandler(logging.Handler):
         self.emojis = emojis
         self.rate_limit_retry = rate_limit_retry
         self.avatar_url = avatar_url
-        self.reentry_barrier = False
         self.embed_line_wrap_threshold = embed_line_wrap_threshold
         self.message_break_char = message_break_char
         self.discord_timeout = discord_timeout
+        self.batch_interval = batch_interval
+        self.drop_oldest = drop_oldest
+        self.queue_size = queue_size
+        # one slot more than log entries may use, the stop signal never has to replace an entry
+        self.queue: queue.Queue[QueuedEmbed | None] = queue.Queue(maxsize=queue_size + 1)
+        self.enqueue_lock = threading.Lock()
+        self.dropped = 0
+        self.dropped_lock = threading.Lock()
+        self.pending: QueuedEmbed | None = None  # entry which did not fit into the previous message
+        self.worker = threading.Thread(
+            target=self.deliver_forever, name="DiscordHandler", daemon=True
+        )
+        self.worker.start()
 
     def split_by_break_character(self, content: str) -> List[str]:
         """Split the inbound log message to several Discord messages.
@@ -122,78 +165,142 @@ class DiscordHandler(logging.Handler):
         )
         discord.execute()
 
+    def enqueue(self, embed: QueuedEmbed):
+        # only producers add entries and they are serialized, so a free slot found here stays free
+        with self.enqueue_lock:
+            if self.queue.qsize() >= self.queue_size:
+                with self.dropped_lock:
+                    self.dropped += 1
+                if not self.drop_oldest:
+                    return
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+            self.queue.put_nowait(embed)
+
     def emit(self, record: logging.LogRecord):
-        """Send a log entry to Discord."""
+        """Queue a log entry for delivery to Discord."""
 
-        if self.reentry_barrier:
+        if threading.current_thread() is self.worker:
             # Don't let Discord and request internals to cause logging
             # and thus infinite recursion. This is because the underlying
             # requests package itself uses logging.
             return
 
-        self.reentry_barrier = True
-
         try:
-
             # About the Embed footer trick
             # https://stackoverflow.com/a/65543555/315168
 
+            # Run internal log message formatting that will expand %s, %d and such
+            inbound_msg = self.format(record)
+
+            # Choose colour and emoji for this log record
+            colour = self.colours.get(record.levelno) or self.colours[None]
+            emoji = self.emojis.get(record.levelno, "")
+            if emoji:
+                # Add some space before the next char
+                emoji += " "
+
+            # This message should be straight forward
+            if emoji:
+                title = f"{emoji}{record.levelname}"
+            else:
+                title = record.levelname
+
+            for msg in self.split_by_break_character(inbound_msg):
+                if not msg:
+                    # Don't attempt to deliver empty messages
+                    continue
+                if len(msg) > MAX_DESCRIPTION_CHARS:
+                    msg = msg[: MAX_DESCRIPTION_CHARS - 1] + "…"
+                self.enqueue(QueuedEmbed(title=title, description=msg, colour=colour))
+        except Exception:
+            self.handleError(record)
+
+    def next_batch(self) -> tuple[list[QueuedEmbed], bool]:
+        """Block until a log entry is queued, then collect further entries for one webhook message.
+
+        Returns the batch and whether the handler was closed."""
+        first = self.pending if self.pending is not None else self.queue.get()
+        self.pending = None
+        if first is None:
+            return [], True
+        batch = [first]
+        length = first.length()
+        deadline = time.monotonic() + self.batch_interval
+        while len(batch) < MAX_EMBEDS_PER_MESSAGE:
             try:
-                # Run internal log message formatting that will expand %s, %d and such
-                inbound_msg = self.format(record)
-
-                # Choose colour and emoji for this log record
-                colour = self.colours.get(record.levelno) or self.colours[None]
-                emoji = self.emojis.get(record.levelno, "")
-                if emoji:
-                    # Add some space before the next char
-                    emoji += " "
-
-                split_msgs = self.split_by_break_character(inbound_msg)
-
-                for msg in split_msgs:
-
-                    if not msg:
-                        # Don't attempt to deliver empty messages
-                        continue
-
-                    # Start preparing the webhook payload for this messgae
-                    discord = DiscordWebhook(
-                        url=self.webhook_url,
-                        username=self.service_name,
-                        rate_limit_retry=self.rate_limit_retry,
-                        avatar_url=self.avatar_url,
-                        timeout=self.discord_timeout,
-                    )
-
-                    # This message should be straight forward
-                    if emoji:
-                        title = f"{emoji}{record.levelname}"
-                    else:
-                        title = record.levelname
-                    embed = DiscordEmbed(title=title, description=msg, color=colour)
-                    discord.add_embed(embed)
-
-                    # Can be one or list of responses,
-                    #  bad API design
-                    resp = discord.execute()
-                    assert isinstance(
-                        resp, Response
-                    ), f"Discord webhook replies: {resp}"
-
-                    # 429 is rate limit status code
-                    # if the request is retried, it would also log another error, which creates
-                    # infinite loop of rate limit
-                    # https://github.com/lovvskillz/python-discord-webhook/blob/64e5fd52c8d171442762a793c224d983a4202251/discord_webhook/webhook.py#L417-L419
-                    if resp.status_code not in [200, 204, 429]:
-                        self.attempt_to_report_failure(resp, discord)
-
+                embed = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if embed is None:
+                return batch, True
+            if length + embed.length() > MAX_CHARS_PER_MESSAGE:
+                # starts the next message
+                self.pending = embed
+                break
+            batch.append(embed)
+            length += embed.length()
+        return batch, False
+
+    def send(self, batch: list[QueuedEmbed]):
+        discord = DiscordWebhook(
+            url=self.webhook_url,
+            username=self.service_name,
+            rate_limit_retry=self.rate_limit_retry,
+            avatar_url=self.avatar_url,
+            timeout=self.discord_timeout,
+        )
+        with self.dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped > 0:
+            # the content does not count towards the embed limits
+            discord.content = f"{dropped} log message(s) were dropped, the Discord log queue was full"
+        for entry in batch:
+            discord.add_embed(
+                DiscordEmbed(
+                    title=entry.title, description=entry.description, color=entry.colour
+                )
+            )
+
+        # Can be one or list of responses,
+        #  bad API design
+        resp = discord.execute()
+        assert isinstance(resp, Response), f"Discord webhook replies: {resp}"
+
+        # 429 is rate limit status code
+        # if the request is retried, it would also log another error, which creates
+        # infinite loop of rate limit
+        # https://github.com/lovvskillz/python-discord-webhook/blob/64e5fd52c8d171442762a793c224d983a4202251/discord_webhook/webhook.py#L417-L419
+        if resp.status_code not in [200, 204, 429]:
+            self.attempt_to_report_failure(resp, discord)
+
+    def deliver_forever(self):
+        """Background thread delivering the queued log entries."""
+        closed = False
+        while not closed:
+            batch, closed = self.next_batch()
+            if len(batch) == 0 and not (closed and self.dropped > 0):
+                # on close a notice about the entries dropped since the last message is still sent
+                continue
+            try:
+                self.send(batch)
             except Exception as e:
                 # We cannot use handleError here, because Discord request may cause
                 # infinite recursion when Discord connection fails and
                 # it tries to log.
                 # We fall back to writing the error to stderr
                 print(f"Error from Discord logger {e}", file=sys.stderr)
-                self.handleError(record)
-        finally:
-            self.reentry_barrier = False
+
+    def close(self):
+        """Deliver the queued log entries and stop the background thread."""
+        if self.worker.is_alive():
+            with self.enqueue_lock:
+                try:
+                    self.queue.put_nowait(None)
+                except queue.Full:
+                    # already closed, the reserved slot holds the stop signal
+                    pass
+            self.worker.join(timeout=self.discord_timeout * 2)
+        super().close()
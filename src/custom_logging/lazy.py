@@ -0,0 +1,23 @@
+import json
+from typing import Any, Callable
+
+
+class LazyJSON(object):
+    """Log message argument serialized to JSON only once a handler formats the record.
+
+    Pass it as `%s` argument instead of building the message with an f-string, so large bodies are not
+    serialized if no handler wants the level. The result is cached for records handled more than once."""
+
+    __slots__ = ("factory", "text")
+
+    factory: Callable[[], Any]
+    text: str | None
+
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+        self.text = None
+
+    def __str__(self) -> str:
+        if self.text is None:
+            self.text = json.dumps(self.factory(), default=str)
+        return self.text
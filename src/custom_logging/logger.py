@@ -3,6 +3,7 @@ from pydantic import ValidationError
 
 from config import GlobalConfig, handleValidationError
 
+from .aggregation import AlertAggregationFilter
 from .provider_map import providerMap
 
 
@@ -18,6 +19,10 @@ class Logger(object):
         logger.setLevel(
             logging.DEBUG
         )  # listen to all messages, let the logProvider decide what to send
+        # alerts are logged by the DNS Updater logger, its filters also apply when listening to the root logger
+        cls.getDNSUpdaterLogger().addFilter(
+            AlertAggregationFilter(window=config.alert_repeat_window)
+        )
         for loggerConfig in config.logging:
             if loggerConfig.provider.upper() not in providerMap:
                 print(
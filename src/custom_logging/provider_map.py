@@ -4,4 +4,5 @@ from .providers import *
 providerMap: dict[str, Type[LogProvider]] = {
     "DISCORD": DiscordLogProvider,
     "STDIO": StdioLogProvider,
+    "JSON": JsonLinesLogProvider,
 }
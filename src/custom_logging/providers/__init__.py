@@ -1,3 +1,4 @@
 from .abstract import LogProvider
 from .stdio import StdioLogProvider
 from .discord import DiscordLogProvider
+from .json_lines import JsonLinesLogProvider
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Any
+from typing import Any, Literal
 import logging
 from ..custom_handlers import DiscordHandler
 
@@ -8,6 +8,9 @@ from .abstract import LogProvider
 
 class DiscordLogProviderConfig(BaseModel):
     webhook_url: str
+    queue_size: int = 1000  # log messages waiting for delivery, further messages are dropped
+    batch_interval: float = 2  # seconds to collect further log messages into one webhook message
+    overflow: Literal["drop_newest", "drop_oldest"] = "drop_newest"
 
 
 class DiscordLogProvider(LogProvider):
@@ -27,6 +30,9 @@ class DiscordLogProvider(LogProvider):
                 logging.INFO: "ℹ️",
                 logging.DEBUG: "",
             },
+            queue_size=config.queue_size,
+            batch_interval=config.batch_interval,
+            drop_oldest=config.overflow == "drop_oldest",
         )
         handler.setLevel(loglevel)
         handler.setFormatter(logging.Formatter("%(message)s"))
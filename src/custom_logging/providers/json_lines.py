@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+from pydantic import BaseModel
+from typing import Any, Literal
+import json
+import logging
+import sys
+
+from .abstract import LogProvider
+
+# passed by the call sites via `extra`, e.g. extra={"provider": ..., "zone": ..., "action": ...}
+STRUCTURED_FIELDS = ("provider", "zone", "record", "action", "duration")
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = record.__dict__.get(field)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class JsonLinesLogProviderConfig(BaseModel):
+    stream: Literal["stdout", "stderr"] = "stdout"
+
+
+class JsonLinesLogProvider(LogProvider):
+    @classmethod
+    def initHandler(
+        cls, loggingConfig: Any, loglevel: int | str = logging.INFO
+    ) -> logging.Handler:
+        config = cls.validateConfig(loggingConfig=loggingConfig)
+        handler = logging.StreamHandler(
+            sys.stdout if config.stream == "stdout" else sys.stderr
+        )
+        handler.setLevel(loglevel)
+        handler.setFormatter(JsonLinesFormatter())
+        return handler
+
+    @staticmethod
+    def validateConfig(loggingConfig: Any) -> JsonLinesLogProviderConfig:
+        return JsonLinesLogProviderConfig.model_validate(loggingConfig or {})
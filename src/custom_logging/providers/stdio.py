@@ -17,18 +17,22 @@ class CustomStreamFormatter(logging.Formatter):
 
     def __init__(self, fmt, *args, **kwargs):
         super().__init__(fmt, *args, **kwargs)
+        # one formatter per level with the color baked into the format string,
+        # so the shared record is never modified
+        self.levelFormatters = {
+            level: logging.Formatter(
+                fmt.replace("%(levelname)s", f"{color}%(levelname)s{self.RESET}"),
+                *args,
+                **kwargs,
+            )
+            for level, color in self.COLOR_MAP.items()
+        }
 
     def format(self, record):
-        # get the color for this record's level
-        color = self.COLOR_MAP.get(record.levelno, self.RESET)
-        # temporarily modify levelname to include color
-        original = record.levelname
-        record.levelname = f"{color}{original}{self.RESET}"
-        try:
+        formatter = self.levelFormatters.get(record.levelno)
+        if formatter is None:
             return super().format(record)
-        finally:
-            # restore it (so other handlers/formatters don't get the colored version)
-            record.levelname = original
+        return formatter.format(record)
 
 
 class StdioLogProvider(LogProvider):
@@ -4,13 +4,15 @@ import os
 
 import asyncio
 import signal
-import aiocron
+import aiohttp
 
 import providers
 from custom_logging import Logger
 
 from config import Config, load_config
-from ip_fetching import ipFetchFails
+from http_sessions import SessionRegistry
+from ip_fetching import ipFetchFails, IPDiscovery, IPv6PrefixDiscovery, AddressWatcher
+from state_store import StateStore
 
 config_location = os.getenv("CONFIG_PATH", "/etc/dns_updater/config.yaml")
 
@@ -27,7 +29,8 @@ if config.global_.dry_run:
 
 
 async def shutdown(
-    signal, loop: asyncio.AbstractEventLoop, providerList: list[providers.AsyncProvider]
+    signal,
+    loop: asyncio.AbstractEventLoop,
 ):
     logger.info(f"Received exit signal {signal.name}…")
     # if you have any shared resources, clean up, cancel tasks
@@ -37,8 +40,7 @@ async def shutdown(
     logger.info("Cancelling outstanding tasks")
     await asyncio.gather(*tasks, return_exceptions=True)
     logger.info("Closing all open aiohttp Sessions")
-    for provider in providerList:
-        await provider.aioSession.close()
+    await SessionRegistry.closeAll()
     loop.stop()
 
 
@@ -52,36 +54,82 @@ async def initProviders() -> list[providers.AsyncProvider]:
     ]
 
 
+async def initIPFetchSession() -> aiohttp.ClientSession:
+    # one pooled session shared by all IP lookups, kept open for the whole runtime
+    return SessionRegistry.getSession("ip-sources")
+
+
 def main():
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
 
     print("Initialising DNS Providers...")
 
+    SessionRegistry.configure(config.global_.http)
+
     providerList: list[providers.AsyncProvider] = loop.run_until_complete(
         initProviders()
     )
+    ipFetchSession = loop.run_until_complete(initIPFetchSession())
+    ipv4Discovery = IPDiscovery(
+        sourcesConfig=config.global_.ipv4_sources,
+        version=4,
+        aioSession=ipFetchSession,
+    )
+    ipv6PrefixDiscoveries = (
+        []
+        if config.global_.disable_v6
+        else [
+            IPv6PrefixDiscovery(
+                prefixConfig=prefixConfig,
+                ipDiscovery=IPDiscovery(
+                    sourcesConfig=prefixConfig.sources,
+                    version=6,
+                    aioSession=ipFetchSession,
+                ),
+            )
+            for prefixConfig in config.global_.ipv6PrefixConfigs()
+        ]
+    )
 
     # Hook signals for graceful shutdown
     for sig in (signal.SIGINT, signal.SIGTERM):
         loop.add_signal_handler(
-            sig, lambda s=sig: asyncio.create_task(shutdown(s, loop, providerList))
+            sig,
+            lambda s=sig: asyncio.create_task(
+                shutdown(s, loop)
+            ),
         )
 
     print("Starting Cron Job...")
 
     consecutive_ip_fails = ipFetchFails()
-
-    # Schedule the cron job every minute
-    cron_job = aiocron.crontab(
-        config.global_.cron,
-        func=lambda: providers.run_all_providers(
-            providers=providerList,
-            config=config,
-            consecutive_ip_fails=consecutive_ip_fails,
-        ),
-        start=True,
+    stateStore = StateStore(state_file=config.global_.state_file)
+
+    # every provider runs on its own cron, at most one run per provider at a time
+    scheduler = providers.ProviderScheduler(
+        providers=providerList,
+        config=config,
+        consecutive_ip_fails=consecutive_ip_fails,
+        stateStore=stateStore,
+        ipv4Discovery=ipv4Discovery,
+        ipv6PrefixDiscoveries=ipv6PrefixDiscoveries,
     )
+    scheduler.start()
+
+    if config.global_.watch is not None:
+        print("Starting Address Watcher...")
+        watcher = AddressWatcher(
+            watchConfig=config.global_.watch,
+            globalConfig=config.global_,
+            ipv4Discovery=ipv4Discovery,
+            ipv6Discoveries=[
+                prefixDiscovery.ipDiscovery
+                for prefixDiscovery in ipv6PrefixDiscoveries
+            ],
+            trigger=scheduler.runAll,
+        )
+        loop.call_soon(watcher.start)
 
     try:
         # Keep loop running
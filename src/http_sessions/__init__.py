@@ -0,0 +1 @@
+from .session_registry import SessionRegistry
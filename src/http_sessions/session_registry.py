@@ -0,0 +1,68 @@
+import ssl
+import sys
+
+import aiohttp
+
+from config import HttpConfig
+from custom_logging import Logger
+
+# interpreters which leak aborted TLS connections unless aiohttp closes them, fixed in 3.12.7 and 3.13.1
+NEEDS_CLEANUP_CLOSED = sys.version_info < (3, 12, 7) or (3, 13, 0) <= sys.version_info < (3, 13, 1)
+
+
+class SessionRegistry(object):
+    """Process-wide aiohttp sessions, one per API host.
+
+    Every provider talking to the same host shares one connection pool, so TCP and TLS connections are
+    kept alive across providers and runs. All sessions share one TLS context and resolve hostnames through
+    aiodns with the configured DNS cache TTL."""
+
+    config: HttpConfig = HttpConfig()
+    sessions: dict[str, aiohttp.ClientSession] = {}
+    _sslContext: ssl.SSLContext | None = None
+
+    @classmethod
+    def configure(cls, config: HttpConfig):
+        cls.config = config
+
+    @classmethod
+    def __getSSLContext(cls) -> ssl.SSLContext:
+        # loading the CA certificates is costly, do it once for all connectors
+        if cls._sslContext is None:
+            cls._sslContext = ssl.create_default_context()
+        return cls._sslContext
+
+    @classmethod
+    def __createConnector(cls) -> aiohttp.TCPConnector:
+        resolver: aiohttp.abc.AbstractResolver | None = None
+        if cls.config.use_aiodns:
+            try:
+                resolver = aiohttp.AsyncResolver()
+            except RuntimeError:
+                Logger.getDNSUpdaterLogger().warning(
+                    "aiodns is not available, falling back to the threaded resolver"
+                )
+        return aiohttp.TCPConnector(
+            limit=cls.config.pool_size,
+            limit_per_host=cls.config.pool_size_per_host,
+            keepalive_timeout=cls.config.keepalive_timeout,
+            ttl_dns_cache=cls.config.dns_cache_ttl,
+            resolver=resolver,
+            ssl=cls.__getSSLContext(),
+            enable_cleanup_closed=NEEDS_CLEANUP_CLOSED,
+        )
+
+    @classmethod
+    def getSession(cls, host: str) -> aiohttp.ClientSession:
+        """Return the shared session for `host`, creating it on first use. Has to be called within the event loop."""
+        session = cls.sessions.get(host)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(connector=cls.__createConnector())
+            cls.sessions[host] = session
+        return session
+
+    @classmethod
+    async def closeAll(cls):
+        for session in cls.sessions.values():
+            await session.close()
+        cls.sessions = {}
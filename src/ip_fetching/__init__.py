@@ -1,3 +1,16 @@
 from .ipv4 import getCurrentIPv4Address
-from .ipv6 import getCurrentIPv6Prefix, calculateIPv6Address
-from .fail_counter import ipFetchFails
\ No newline at end of file
+from .ipv6 import (
+    getCurrentIPv6Prefixes,
+    deriveIPv6Address,
+    deriveIPv6Addresses,
+    deriveIPv6Prefix,
+    IPv6Prefix,
+    IPv6PrefixDiscovery,
+    formatIPv6Prefix,
+    parseIPv6Suffix,
+    parsePrefixOffset,
+)
+from .fail_counter import ipFetchFails, IPSourceStats
+from .discovery import IPDiscovery
+from .source_map import sourceMap
+from .address_watcher import AddressWatcher
@@ -0,0 +1,199 @@
+import asyncio
+import socket
+from typing import Any, Callable, Coroutine
+
+from config import GlobalConfig, IPSourcesConfig, WatchConfig
+from custom_logging import Logger
+
+from .discovery import IPDiscovery
+from .fail_counter import ipFetchFails
+from .source_map import sourceMap
+
+# multicast groups of rtnetlink address notifications, see linux/rtnetlink.h
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+
+
+class AddressWatcher(object):
+    """Triggers an update shortly after the local addresses change.
+
+    `netlink` mode listens to kernel address notifications, `poll` mode queries the local ip sources
+    (`interface`) every `poll_interval` seconds. If an address has no local source its remote sources are
+    polled instead, but only every `remote_poll_interval` seconds, so public lookup services are not hammered.
+    Changes are debounced, a change during a running update triggers one more update afterwards."""
+
+    config: WatchConfig
+    globalConfig: GlobalConfig
+    ipv4Discovery: IPDiscovery
+    ipv6Discoveries: list[IPDiscovery]  # one per delegated prefix
+    trigger: Callable[[], Coroutine[Any, Any, Any]]
+    _socket: socket.socket | None
+    _task: asyncio.Task | None
+    _debounceHandle: asyncio.TimerHandle | None
+    _running: asyncio.Task | None
+    _rerun: bool
+
+    def __init__(
+        self,
+        watchConfig: WatchConfig,
+        globalConfig: GlobalConfig,
+        ipv4Discovery: IPDiscovery,
+        ipv6Discoveries: list[IPDiscovery],
+        trigger: Callable[[], Coroutine[Any, Any, Any]],
+    ):
+        self.config = watchConfig
+        self.globalConfig = globalConfig
+        self.ipv4Discovery = ipv4Discovery
+        self.ipv6Discoveries = ipv6Discoveries
+        self.trigger = trigger
+        self._socket = None
+        self._task = None
+        self._debounceHandle = None
+        self._running = None
+        self._rerun = False
+
+    def start(self):
+        logger = Logger.getDNSUpdaterLogger()
+        if self.config.mode == "netlink":
+            try:
+                self._startNetlink()
+                logger.debug("Watching netlink address notifications")
+                return
+            except (OSError, AttributeError) as e:
+                # AF_NETLINK is Linux only and might be blocked in restricted containers
+                logger.warning(
+                    f"Unable to listen to netlink address notifications ({e}), falling back to polling"
+                )
+        self._task = asyncio.create_task(self._poll())
+
+    def stop(self):
+        if self._socket is not None:
+            asyncio.get_running_loop().remove_reader(self._socket.fileno())
+            self._socket.close()
+            self._socket = None
+        if self._task is not None:
+            self._task.cancel()
+        if self._debounceHandle is not None:
+            self._debounceHandle.cancel()
+
+    def _startNetlink(self):
+        groups = 0
+        if not self.globalConfig.disable_v4:
+            groups |= RTMGRP_IPV4_IFADDR
+        if not self.globalConfig.disable_v6:
+            groups |= RTMGRP_IPV6_IFADDR
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        sock.bind((0, groups))
+        sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(sock.fileno(), self._onNetlinkMessage)
+        self._socket = sock
+
+    def _onNetlinkMessage(self):
+        # content is irrelevant, the update itself determines the new addresses
+        try:
+            while self._socket is not None:
+                self._socket.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            pass
+        self.notifyChange()
+
+    async def _currentAddresses(
+        self, consecutive_ip_fails: ipFetchFails
+    ) -> list[str | None]:
+        async def discover(discovery: IPDiscovery, disabled: bool) -> str | None:
+            if disabled:
+                return None
+            return (await discovery.discover(consecutive_ip_fails))[0]
+
+        return await asyncio.gather(
+            discover(self.ipv4Discovery, self.globalConfig.disable_v4),
+            *(
+                discover(ipv6Discovery, self.globalConfig.disable_v6)
+                for ipv6Discovery in self.ipv6Discoveries
+            ),
+        )
+
+    @staticmethod
+    def _localDiscovery(discovery: IPDiscovery) -> IPDiscovery | None:
+        # the local sources of `discovery` only, None if it has none
+        sources = [
+            sourceConfig
+            for sourceConfig in discovery.config.sources
+            if sourceConfig.source.upper() in sourceMap
+            and sourceMap[sourceConfig.source.upper()].local
+        ]
+        if not sources:
+            return None
+        return IPDiscovery(
+            sourcesConfig=IPSourcesConfig(sources=sources),
+            version=discovery.version,
+            aioSession=discovery.aioSession,
+        )
+
+    def _pollDiscoveries(self) -> float:
+        # switch to the local sources if every polled address has one, returns the poll interval
+        ipv4Local = self._localDiscovery(self.ipv4Discovery)
+        ipv6Locals = [self._localDiscovery(discovery) for discovery in self.ipv6Discoveries]
+        if (not self.globalConfig.disable_v4 and ipv4Local is None) or (
+            not self.globalConfig.disable_v6 and None in ipv6Locals
+        ):
+            Logger.getDNSUpdaterLogger().info(
+                f"Not every address has a local ip source, polling the configured sources every {self.config.remote_poll_interval} seconds"
+            )
+            return self.config.remote_poll_interval
+        if ipv4Local is not None:
+            self.ipv4Discovery = ipv4Local
+        self.ipv6Discoveries = [
+            local if local is not None else discovery
+            for local, discovery in zip(ipv6Locals, self.ipv6Discoveries)
+        ]
+        return self.config.poll_interval
+
+    async def _poll(self):
+        # separate statistics, so polling failures don't raise alerts
+        consecutive_ip_fails = ipFetchFails()
+        interval = self._pollDiscoveries()
+        last = await self._currentAddresses(consecutive_ip_fails)
+        while True:
+            await asyncio.sleep(interval)
+            current = await self._currentAddresses(consecutive_ip_fails)
+            enabled = [not self.globalConfig.disable_v4] + [
+                not self.globalConfig.disable_v6
+            ] * len(self.ipv6Discoveries)
+            if any(
+                value is None
+                for value, isEnabled in zip(current, enabled)
+                if isEnabled
+            ):
+                # lookup failed, keep the last known addresses
+                continue
+            if current != last:
+                Logger.getDNSUpdaterLogger().info(
+                    f"Address change detected: {last} -> {current}"
+                )
+                last = current
+                self.notifyChange()
+
+    def notifyChange(self):
+        if self._debounceHandle is not None:
+            self._debounceHandle.cancel()
+        self._debounceHandle = asyncio.get_running_loop().call_later(
+            self.config.debounce, self._fire
+        )
+
+    def _fire(self):
+        self._debounceHandle = None
+        if self._running is not None and not self._running.done():
+            self._rerun = True
+            return
+        self._running = asyncio.create_task(self.trigger())
+        self._running.add_done_callback(self._onTriggerDone)
+
+    def _onTriggerDone(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            Logger.getDNSUpdaterLogger().error(
+                f"Address change triggered update failed: {task.exception()!r}"
+            )
+        if self._rerun:
+            self._rerun = False
+            self._fire()
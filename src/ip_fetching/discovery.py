@@ -0,0 +1,131 @@
+import asyncio
+import ipaddress
+import time
+import aiohttp
+
+from config import IPSourcesConfig
+from custom_logging import Logger
+
+from .fail_counter import ipFetchFails
+from .source_map import sourceMap
+from .sources import IPSource, IPSourceError
+
+
+class IPDiscovery(object):
+    """Queries the configured IP sources of one address family concurrently.
+
+    In `race` mode the first valid answer wins, in `quorum` mode the first value
+    reported by `quorum` sources wins. Sources are ordered by their health score, in `race`
+    mode only the `fanout` best ones are queried and the demoted ones only if none of them answers."""
+
+    version: int
+    config: IPSourcesConfig
+    sources: list[IPSource]
+    aioSession: aiohttp.ClientSession
+    _pending: set[asyncio.Task]
+
+    def __init__(
+        self,
+        sourcesConfig: IPSourcesConfig,
+        version: int,
+        aioSession: aiohttp.ClientSession,
+    ):
+        self.version = version
+        self.config = sourcesConfig
+        self.aioSession = aioSession
+        self._pending = set()
+        self.sources = []
+        for sourceConfig in sourcesConfig.sources:
+            if sourceConfig.source.upper() not in sourceMap:
+                print(
+                    f"Skipping unknown IPv{version} source '{sourceConfig.source}' in config"
+                )
+                continue
+            self.sources.append(
+                sourceMap[sourceConfig.source.upper()](
+                    sourceConfig=sourceConfig, version=version
+                )
+            )
+
+    def _statsKey(self, source: IPSource) -> str:
+        return f"IPv{self.version} {source.name}"
+
+    async def _query(
+        self, source: IPSource, consecutive_ip_fails: ipFetchFails
+    ) -> tuple[str | None, str | None]:
+        logger = Logger.getDNSUpdaterLogger()
+        stats = consecutive_ip_fails.getSourceStats(self._statsKey(source))
+        start = time.monotonic()
+        try:
+            value = await asyncio.wait_for(
+                source.fetch(self.aioSession), timeout=source.timeout
+            )
+            address = ipaddress.ip_address(value)
+            if address.version != self.version:
+                raise ValueError(f"{value} is not an IPv{self.version} Address")
+        except asyncio.TimeoutError:
+            error = "Timeout"
+        except aiohttp.ClientConnectionError:
+            error = "Unable to establish connection"
+        except (IPSourceError, ValueError, aiohttp.ClientError, OSError) as e:
+            error = str(e) or type(e).__name__
+        else:
+            stats.recordSuccess(time.monotonic() - start)
+            return address.compressed, None
+        stats.recordFailure(source.timeout)
+        logger.debug(f"IPv{self.version} source {source.name} failed: {error}")
+        return None, f"{source.name}: {error}"
+
+    def _rankedSources(self, consecutive_ip_fails: ipFetchFails) -> list[list[IPSource]]:
+        # sources to query one group after another, the next group only if the previous one failed
+        ranked = sorted(
+            self.sources,
+            key=lambda source: consecutive_ip_fails.getSourceStats(
+                self._statsKey(source)
+            ).score(),
+        )
+        if self.config.fanout is not None and self.config.mode == "race":
+            fanout = max(self.config.fanout, 1)
+            return [group for group in (ranked[:fanout], ranked[fanout:]) if group]
+        return [ranked]
+
+    async def discover(
+        self, consecutive_ip_fails: ipFetchFails
+    ) -> tuple[str | None, list[str]]:
+        """Returns the discovered address, or None and the failure reason of every queried source."""
+        errors: list[str] = []
+        for sources in self._rankedSources(consecutive_ip_fails):
+            value, groupErrors = await self._queryGroup(sources, consecutive_ip_fails)
+            if value is not None:
+                return value, []
+            errors.extend(groupErrors)
+        return None, errors
+
+    async def _queryGroup(
+        self, sources: list[IPSource], consecutive_ip_fails: ipFetchFails
+    ) -> tuple[str | None, list[str]]:
+        tasks = [
+            asyncio.create_task(self._query(source, consecutive_ip_fails))
+            for source in sources
+        ]
+        errors: list[str] = []
+        votes: dict[str, int] = {}
+        required = self.config.quorum if self.config.mode == "quorum" else 1
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                value, error = await next_done
+                if error is not None:
+                    errors.append(error)
+                    continue
+                votes[value] = votes.get(value, 0) + 1
+                if votes[value] >= required:
+                    return value, []
+        finally:
+            # let the slower sources finish in the background, so their latency is still scored
+            for task in tasks:
+                if not task.done():
+                    self._pending.add(task)
+                    task.add_done_callback(self._pending.discard)
+        if votes:
+            errors.append(f"No quorum reached, answers: {votes}")
+        return None, errors
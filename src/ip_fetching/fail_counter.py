@@ -1,6 +1,42 @@
 from pydantic import BaseModel
+from typing import ClassVar
+
+
+class IPSourceStats(BaseModel):
+    successes: int = 0
+    failures: int = 0
+    consecutive_fails: int = 0
+    latency_ewma: float | None = None  # seconds, failures count with the source timeout
+
+    smoothing: ClassVar[float] = 0.3  # weight of the newest latency sample
+
+    def _recordLatency(self, latency: float):
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += self.smoothing * (latency - self.latency_ewma)
+
+    def recordSuccess(self, latency: float):
+        self.successes += 1
+        self.consecutive_fails = 0
+        self._recordLatency(latency)
+
+    def recordFailure(self, penalty: float):
+        self.failures += 1
+        self.consecutive_fails += 1
+        self._recordLatency(penalty)
+
+    def score(self) -> float:
+        # lower is better, unmeasured sources are tried first
+        return (self.latency_ewma or 0) * (1 + self.consecutive_fails)
 
 
 class ipFetchFails(BaseModel):
     ipV4Fail: int = 0
     ipV6Fail: int = 0
+    sources: dict[str, IPSourceStats] = {}  # dict[IPv{version} source name, IPSourceStats]
+
+    def getSourceStats(self, key: str) -> IPSourceStats:
+        if key not in self.sources:
+            self.sources[key] = IPSourceStats()
+        return self.sources[key]
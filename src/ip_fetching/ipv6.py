@@ -1,76 +1,249 @@
-import requests
+import asyncio
+import functools
 import ipaddress as ipaddress
+from typing import NamedTuple
 
-from config import Config
+from config import Config, IPv6PrefixConfig
 from custom_logging import Logger
 
+from .discovery import IPDiscovery
 from .fail_counter import ipFetchFails
 
 
-def calculateIPv6Address(
-    prefix: list[str], prefixOffset: str, currentAddressOrFixedSuffix: str
-) -> str:
-    prefix_int = int("".join(prefix[:4]), 16)
-    prefix_id_int = int(prefixOffset, 10)
-    if f"{(prefix_int + prefix_id_int):016x}".__len__() > 16:
+# the prefix is handled as the upper 64 bits of an address, suffixes as the lower 64 bits
+HOST_BITS = 64
+HOST_MASK = (1 << HOST_BITS) - 1
+DERIVED_ADDRESS_CACHE_SIZE = 65536
+# records use few distinct subnets, a handful per prefix
+SUBNET_CACHE_SIZE = 4096
+
+
+def parseIPv6Suffix(suffix: str) -> int:
+    return int(ipaddress.IPv6Address(suffix)) & HOST_MASK
+
+
+def parsePrefixOffset(prefixOffset: str) -> int:
+    return int(prefixOffset, 10)
+
+
+class IPv6Prefix(NamedTuple):
+    network: int  # upper 64 bits of the delegated prefix
+    length: int | None = None  # delegated prefix length, None adds record offsets to the upper 64 bits
+
+
+def formatIPv6Prefix(prefix: IPv6Prefix) -> str:
+    return str(
+        ipaddress.IPv6Network(
+            (prefix.network << HOST_BITS, HOST_BITS if prefix.length is None else prefix.length)
+        )
+    )
+
+
+def _subnet(prefix: IPv6Prefix, prefixOffset: int) -> int:
+    # upper 64 bits of the subnet `prefixOffset` of the delegated prefix
+    if prefix.length is None:
+        network = prefix.network + prefixOffset
+        if not 0 <= network <= HOST_MASK:
+            raise ValueError(
+                f"The generated prefix for base prefix {formatIPv6Prefix(prefix)} and prefixOffset {prefixOffset} is overflowing. Please check your config."
+            )
+        return network
+    if not 0 <= prefixOffset < 1 << (HOST_BITS - prefix.length):
+        raise ValueError(
+            f"The prefixOffset {prefixOffset} does not fit into the delegated prefix {formatIPv6Prefix(prefix)}. Please check your config."
+        )
+    return prefix.network | prefixOffset
+
+
+class _Half(NamedTuple):
+    # the four 16 bit groups of 64 bits of an address, hex without leading zeros, and their zero runs
+    hextets: tuple[str, ...]
+    runStart: int  # first longest run of zero groups, length 0 if there is none
+    runLength: int
+    leadingZeros: int
+    trailingZeros: int
+
+
+def _zeroRuns(zeroMask: int) -> tuple[int, int, int, int]:
+    # run start, run length, leading and trailing zero groups of 4 groups, bit 3 of `zeroMask` is the first
+    zero = [bool(zeroMask & (8 >> i)) for i in range(4)]
+    runStart, runLength = 0, 0
+    start = -1
+    for i, isZero in enumerate(zero):
+        if not isZero:
+            start = -1
+            continue
+        if start < 0:
+            start = i
+        if i - start + 1 > runLength:
+            runStart, runLength = start, i - start + 1
+    # the runs at either end can be shorter than the longest one, e.g. in "0:1:0:0"
+    leadingZeros = next((i for i, isZero in enumerate(zero) if not isZero), 4)
+    trailingZeros = next((i for i, isZero in enumerate(reversed(zero)) if not isZero), 4)
+    return runStart, runLength, leadingZeros, trailingZeros
+
+
+ZERO_RUNS = [_zeroRuns(zeroMask) for zeroMask in range(16)]
+
+
+def _half(value: int) -> _Half:
+    g0, g1, g2, g3 = (value >> 48) & 0xFFFF, (value >> 32) & 0xFFFF, (value >> 16) & 0xFFFF, value & 0xFFFF
+    zeroMask = (g0 == 0) << 3 | (g1 == 0) << 2 | (g2 == 0) << 1 | (g3 == 0)
+    return _Half((f"{g0:x}", f"{g1:x}", f"{g2:x}", f"{g3:x}"), *ZERO_RUNS[zeroMask])
+
+
+@functools.lru_cache(maxsize=SUBNET_CACHE_SIZE)
+def _subnetHalf(prefix: IPv6Prefix, prefixOffset: int) -> _Half:
+    # the upper 64 bits are shared by every record in the same subnet
+    return _half(_subnet(prefix, prefixOffset))
+
+
+def _formatIPv6(upper: _Half, lower: _Half) -> str:
+    # RFC 5952 text form as produced by ipaddress: the first longest run of two or more zero groups is "::",
+    # it is the longest run of either half or the run across the border of both
+    runStart, runLength = upper.runStart, upper.runLength
+    border = upper.trailingZeros + lower.leadingZeros
+    if border > runLength:
+        runStart, runLength = 4 - upper.trailingZeros, border
+    if lower.runLength > runLength:
+        runStart, runLength = 4 + lower.runStart, lower.runLength
+    hextets = upper.hextets + lower.hextets
+    if runLength < 2:
+        return ":".join(hextets)
+    return ":".join(hextets[:runStart]) + "::" + ":".join(hextets[runStart + runLength :])
+
+
+@functools.lru_cache(maxsize=DERIVED_ADDRESS_CACHE_SIZE)
+def deriveIPv6Address(prefix: IPv6Prefix, prefixOffset: int, suffix: int) -> str:
+    """Address of a record in the subnet `prefixOffset` of the delegated `prefix`, memoized per input."""
+    return _formatIPv6(_subnetHalf(prefix, prefixOffset), _half(suffix))
+
+
+@functools.lru_cache(maxsize=DERIVED_ADDRESS_CACHE_SIZE)
+def deriveIPv6Addresses(
+    prefixes: tuple[IPv6Prefix, ...], prefixOffset: int, suffix: int
+) -> tuple[str, ...]:
+    """Addresses of a record in all active `prefixes` at once, sorted to compare them with the record values.
+
+    The suffix is split into groups once and shared by all addresses."""
+    lower = _half(suffix)
+    return tuple(sorted(_formatIPv6(_subnetHalf(prefix, prefixOffset), lower) for prefix in prefixes))
+
+
+def deriveIPv6Prefix(
+    address: str, currentPrefixOffset: int, prefixLength: int | None = None
+) -> IPv6Prefix:
+    # the delegated prefix is the prefix of the local network minus its offset
+    network = (int(ipaddress.IPv6Address(address)) >> HOST_BITS) - currentPrefixOffset
+    if not 0 <= network <= HOST_MASK:
         raise ValueError(
-            f"The generated prefix for base prefix {':'.join(prefix[:4])} and prefixOffset {prefixOffset} is overflowing. Please check your config."
+            f"The generated prefix for address {address} and current_prefix_offset {currentPrefixOffset} is overflowing. Please check your config."
         )
-    new_prefix = f"{(prefix_int + prefix_id_int) & 0xFFFFFFFFFFFFFFFF:016x}"
-    return ipaddress.IPv6Address(
-        ":".join(new_prefix[i : i + 4] for i in range(0, len(new_prefix), 4))
-        + ":"
-        + ":".join(
-            ipaddress.IPv6Address(currentAddressOrFixedSuffix).exploded.split(sep=":")[
-                -4:
-            ]
+    if prefixLength is not None:
+        # drop the subnet id bits of the local network
+        network &= HOST_MASK ^ ((1 << (HOST_BITS - prefixLength)) - 1)
+    return IPv6Prefix(network, prefixLength)
+
+
+class IPv6PrefixDiscovery(object):
+    """Discovery of one delegated prefix, e.g. of one uplink.
+
+    The last discovered prefix is kept through failed discoveries, so a flaky source does not withdraw the
+    addresses of a prefix from the records. Only with `withdraw_after` they are removed after that many
+    failed discoveries in a row."""
+
+    name: str | None
+    alertKey: str  # groups the failures of this prefix in the alert aggregation
+    prefixLength: int | None
+    currentPrefixOffset: int
+    withdrawAfter: int | None
+    ipDiscovery: IPDiscovery
+    prefix: IPv6Prefix | None
+    consecutiveFails: int
+
+    def __init__(self, prefixConfig: IPv6PrefixConfig, ipDiscovery: IPDiscovery):
+        self.name = prefixConfig.name
+        self.prefixLength = prefixConfig.prefix_length
+        self.currentPrefixOffset = (
+            0
+            if prefixConfig.current_prefix_offset is None
+            else parsePrefixOffset(prefixConfig.current_prefix_offset)
         )
-    ).compressed
-
-
-def getCurrentIPv6Prefix(
-    config: Config, consecutive_ip_fails: ipFetchFails
-) -> list[str] | None:
-    logger = Logger.getDNSUpdaterLogger()
-    logger.debug("Getting current IPv6 Address")
-    try:
-        ipv6Address_response = requests.get("https://api6.ipify.org", timeout=5)
-        if ipv6Address_response.status_code == 200:
-            if ipv6Address_response.text is not None:
-                consecutive_ip_fails.ipV6Fail = 0
-                ipv6Prefix = calculateIPv6Address(
-                    prefix=ipaddress.IPv6Address(ipv6Address_response.text).exploded.split(":"),
-                    prefixOffset="-"
-                    + str(config.global_.current_prefix_offset),  # negative Offset
-                    currentAddressOrFixedSuffix="::",
-                ).split(":")
-                return ipv6Prefix
-        else:
-            consecutive_ip_fails.ipV4Fail += 1
+        self.withdrawAfter = prefixConfig.withdraw_after
+        self.ipDiscovery = ipDiscovery
+        # unnamed prefixes are told apart by their sources
+        self.alertKey = "ipv6-" + (
+            self.name
+            if self.name is not None
+            else ",".join(source.name for source in ipDiscovery.sources)
+        )
+        self.prefix = None
+        self.consecutiveFails = 0
+
+    async def discover(
+        self, config: Config, consecutive_ip_fails: ipFetchFails
+    ) -> IPv6Prefix | None:
+        logger = Logger.getDNSUpdaterLogger()
+        label = "" if self.name is None else f" of prefix {self.name}"
+        logger.debug(f"Getting current IPv6 Address{label}")
+        ipv6Address, errors = await self.ipDiscovery.discover(consecutive_ip_fails)
+        if ipv6Address is None:
+            self.consecutiveFails += 1
+            if self.consecutiveFails > config.global_.allowed_consecutive_ip_fetch_timeouts:
+                logger.error(
+                    f"Unable to get current IPv6 Address{label} {self.consecutiveFails} time(s) in a row:\n"
+                    + "\n".join(errors),
+                    extra={"alert": self.alertKey},
+                )
             if (
-                consecutive_ip_fails.ipV6Fail
-                > config.global_.allowed_consecutive_ip_fetch_timeouts
+                self.withdrawAfter is not None
+                and self.consecutiveFails >= self.withdrawAfter
+                and self.prefix is not None
             ):
-                logger.error(
-                    f"Non OK Response {consecutive_ip_fails.ipV4Fail} time(s) in a row getting current IPv4 Address",
+                logger.warning(
+                    f"Removing the IPv6 Addresses{label} from the records after {self.consecutiveFails} failed discoveries"
                 )
-    except requests.exceptions.ConnectTimeout:
-        consecutive_ip_fails.ipV6Fail += 1
-        if (
-            consecutive_ip_fails.ipV6Fail
-            > config.global_.allowed_consecutive_ip_fetch_timeouts
-        ):
-            logger.error(
-                f"Timeout getting current IPv6 Address {consecutive_ip_fails.ipV6Fail} time(s) in a row"
+                self.prefix = None
+            return self.prefix
+        if self.consecutiveFails > config.global_.allowed_consecutive_ip_fetch_timeouts:
+            # only after the failures were reported
+            logger.info(
+                f"Current IPv6 Address{label} available again",
+                extra={"resolves": self.alertKey},
             )
-    except requests.exceptions.ConnectionError:
-        consecutive_ip_fails.ipV6Fail += 1
-        if (
-            consecutive_ip_fails.ipV6Fail
-            > config.global_.allowed_consecutive_ip_fetch_timeouts
-        ):
-            logger.error(
-                f"Unable to establish connection {consecutive_ip_fails.ipV6Fail} time(s) in a row getting current IPv6 Address",
+        self.consecutiveFails = 0
+        try:
+            self.prefix = deriveIPv6Prefix(
+                address=ipv6Address,
+                currentPrefixOffset=self.currentPrefixOffset,
+                prefixLength=self.prefixLength,
             )
-    except ValueError as e:
-        logger.error(str(e.args))
+        except ValueError as e:
+            logger.error(str(e.args))
+            self.prefix = None
+        return self.prefix
+
+
+async def getCurrentIPv6Prefixes(
+    config: Config,
+    consecutive_ip_fails: ipFetchFails,
+    prefixDiscoveries: list[IPv6PrefixDiscovery],
+) -> tuple[IPv6Prefix, ...] | None:
+    """All currently active delegated prefixes, None if none of them could be discovered."""
+    prefixes = await asyncio.gather(
+        *(
+            prefixDiscovery.discover(config, consecutive_ip_fails)
+            for prefixDiscovery in prefixDiscoveries
+        )
+    )
+    active = tuple(
+        sorted(
+            set(prefix for prefix in prefixes if prefix is not None),
+            key=lambda prefix: prefix.network,
+        )
+    )
+    if len(active) == 0:
+        consecutive_ip_fails.ipV6Fail += 1
+        return None
+    consecutive_ip_fails.ipV6Fail = 0
+    return active
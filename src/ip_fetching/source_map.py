@@ -0,0 +1,9 @@
+from typing import Type
+from .sources import *
+
+sourceMap: dict[str, Type[IPSource]] = {
+    "HTTP": HttpIPSource,
+    "DNS": DnsIPSource,
+    "STATIC": StaticIPSource,
+    "INTERFACE": InterfaceIPSource,
+}
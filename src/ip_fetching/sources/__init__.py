@@ -0,0 +1,5 @@
+from .abstract import IPSource, IPSourceError
+from .http import HttpIPSource
+from .dns import DnsIPSource
+from .static import StaticIPSource
+from .interface import InterfaceIPSource
@@ -0,0 +1,41 @@
+from abc import ABC, abstractmethod
+from pydantic import ValidationError
+from typing import Any
+import aiohttp
+
+from config import IPSourceConfig, handleValidationError
+
+
+class IPSourceError(Exception):
+    """Raised by an IPSource if it could not determine the current address."""
+
+
+class IPSource(ABC):
+    name: str
+    version: int  # 4 or 6
+    timeout: float
+    config: Any
+    local: bool = False  # answered without any network request, cheap enough to poll every few seconds
+
+    def __init__(self, sourceConfig: IPSourceConfig, version: int):
+        try:
+            self.config = self.validateConfig(sourceConfig.source_config)
+        except ValidationError as e:
+            handleValidationError(e, f"{sourceConfig.source} ip source config")
+        self.version = version
+        self.timeout = sourceConfig.timeout
+        self.name = sourceConfig.name or self.defaultName()
+
+    @staticmethod
+    @abstractmethod
+    def validateConfig(sourceConfig: Any) -> Any:
+        pass
+
+    @abstractmethod
+    def defaultName(self) -> str:
+        pass
+
+    @abstractmethod
+    async def fetch(self, aioSession: aiohttp.ClientSession) -> str:
+        pass
+        # return the current address, raise IPSourceError if it can not be determined
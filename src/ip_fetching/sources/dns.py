@@ -0,0 +1,45 @@
+from pydantic import BaseModel
+from typing import Any, Literal
+import aiodns
+import aiohttp
+
+from .abstract import IPSource, IPSourceError
+
+
+class DnsIPSourceConfig(BaseModel):
+    query: str = "myip.opendns.com"
+    nameservers: list[str] = [
+        "208.67.222.222",
+        "208.67.220.220",
+    ]  # IP addresses of the resolvers answering with the client address
+    qtype: Literal["A", "AAAA", "TXT"] | None = None  # A for IPv4, AAAA for IPv6 if unset
+
+
+class DnsIPSource(IPSource):
+    """DNS based lookup, e.g. OpenDNS `myip.opendns.com` or Google `o-o.myaddr.l.google.com` (TXT)"""
+
+    config: DnsIPSourceConfig
+    resolver: aiodns.DNSResolver | None = None
+
+    @staticmethod
+    def validateConfig(sourceConfig: Any) -> DnsIPSourceConfig:
+        return DnsIPSourceConfig.model_validate(sourceConfig or {})
+
+    def defaultName(self) -> str:
+        return f"{self.config.query}@{self.config.nameservers[0]}"
+
+    async def fetch(self, aioSession: aiohttp.ClientSession) -> str:
+        if self.resolver is None:
+            # created lazily, the resolver binds to the running event loop
+            self.resolver = aiodns.DNSResolver(nameservers=self.config.nameservers)
+        qtype = self.config.qtype or ("A" if self.version == 4 else "AAAA")
+        try:
+            answers = await self.resolver.query(self.config.query, qtype)
+        except aiodns.error.DNSError as e:
+            raise IPSourceError(f"DNS Error {e.args}")
+        if not answers:
+            raise IPSourceError("Empty DNS Response")
+        if qtype == "TXT":
+            text = answers[0].text
+            return (text.decode() if isinstance(text, bytes) else text).strip()
+        return answers[0].host
@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import Any
+import aiohttp
+
+from .abstract import IPSource, IPSourceError
+
+
+class HttpIPSourceConfig(BaseModel):
+    url: str
+
+
+class HttpIPSource(IPSource):
+    """Plain text IP echo service, e.g. api.ipify.org"""
+
+    config: HttpIPSourceConfig
+
+    @staticmethod
+    def validateConfig(sourceConfig: Any) -> HttpIPSourceConfig:
+        return HttpIPSourceConfig.model_validate(sourceConfig or {})
+
+    def defaultName(self) -> str:
+        return self.config.url
+
+    async def fetch(self, aioSession: aiohttp.ClientSession) -> str:
+        async with aioSession.get(
+            self.config.url, timeout=aiohttp.ClientTimeout(total=self.timeout)
+        ) as response:
+            if response.status != 200:
+                raise IPSourceError(f"Non OK Response {response.status}")
+            return (await response.text()).strip()
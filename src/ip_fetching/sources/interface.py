@@ -0,0 +1,122 @@
+from pydantic import BaseModel
+from typing import Any, Literal
+import aiohttp
+import fcntl
+import ipaddress
+import socket
+import struct
+
+from .abstract import IPSource, IPSourceError
+
+IF_INET6_PATH = "/proc/net/if_inet6"
+SIOCGIFADDR = 0x8915
+
+# scope and flag values as listed in /proc/net/if_inet6, see linux/include/net/ipv6.h and linux/if_addr.h
+IPV6_SCOPES = {"global": 0x00, "host": 0x10, "link": 0x20, "site": 0x40}
+IFA_F_TEMPORARY = 0x01
+IFA_F_TENTATIVE = 0x40
+IFA_F_DEPRECATED = 0x20
+
+
+class InterfaceAddress(BaseModel):
+    address: str
+    interface: str
+    prefix_length: int
+    scope: int
+    flags: int
+
+
+class InterfaceIPSourceConfig(BaseModel):
+    interfaces: list[str] | None = None  # all interfaces if unset, required for IPv4
+    scope: Literal["global", "site", "link", "host"] = "global"  # IPv6 only
+    exclude_temporary: bool = True  # skip IPv6 privacy extension addresses
+    exclude_deprecated: bool = True
+    exclude_private: bool = True  # skip RFC 1918 / ULA addresses
+
+
+def readIPv6InterfaceAddresses(path: str = IF_INET6_PATH) -> list[InterfaceAddress]:
+    addresses: list[InterfaceAddress] = []
+    with open(path, "r") as file:
+        for line in file:
+            fields = line.split()
+            if len(fields) < 6:
+                continue
+            address, _, prefix_length, scope, flags, interface = fields[:6]
+            addresses.append(
+                InterfaceAddress(
+                    address=str(ipaddress.IPv6Address(int(address, 16))),
+                    interface=interface,
+                    prefix_length=int(prefix_length, 16),
+                    scope=int(scope, 16),
+                    flags=int(flags, 16),
+                )
+            )
+    return addresses
+
+
+def readIPv4InterfaceAddress(interface: str) -> str:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        ifreq = fcntl.ioctl(
+            sock.fileno(), SIOCGIFADDR, struct.pack("256s", interface[:15].encode())
+        )
+    return socket.inet_ntoa(ifreq[20:24])
+
+
+class InterfaceIPSource(IPSource):
+    """Address of a local network interface, e.g. the WAN interface of a router.
+    Avoids any external lookup, IPv6 from /proc/net/if_inet6, IPv4 via SIOCGIFADDR."""
+
+    config: InterfaceIPSourceConfig
+    local = True
+
+    @staticmethod
+    def validateConfig(sourceConfig: Any) -> InterfaceIPSourceConfig:
+        return InterfaceIPSourceConfig.model_validate(sourceConfig or {})
+
+    def defaultName(self) -> str:
+        return f"interface {",".join(self.config.interfaces or ["*"])}"
+
+    def _matchesIPv6(self, entry: InterfaceAddress) -> bool:
+        if self.config.interfaces is not None and entry.interface not in self.config.interfaces:
+            return False
+        if entry.scope != IPV6_SCOPES[self.config.scope]:
+            return False
+        if entry.flags & IFA_F_TENTATIVE:
+            return False
+        if self.config.exclude_temporary and entry.flags & IFA_F_TEMPORARY:
+            return False
+        if self.config.exclude_deprecated and entry.flags & IFA_F_DEPRECATED:
+            return False
+        if self.config.exclude_private and ipaddress.IPv6Address(entry.address).is_private:
+            return False
+        return True
+
+    def getIPv6Addresses(self) -> list[str]:
+        try:
+            entries = readIPv6InterfaceAddresses()
+        except OSError as e:
+            raise IPSourceError(f"Unable to read {IF_INET6_PATH}: {e}")
+        return [entry.address for entry in entries if self._matchesIPv6(entry)]
+
+    def getIPv4Addresses(self) -> list[str]:
+        if not self.config.interfaces:
+            raise IPSourceError("`interfaces` is required for IPv4 interface sources")
+        addresses: list[str] = []
+        for interface in self.config.interfaces:
+            try:
+                address = readIPv4InterfaceAddress(interface)
+            except OSError:
+                # interface missing or without IPv4 address
+                continue
+            if self.config.exclude_private and ipaddress.IPv4Address(address).is_private:
+                continue
+            addresses.append(address)
+        return addresses
+
+    async def fetch(self, aioSession: aiohttp.ClientSession) -> str:
+        addresses = (
+            self.getIPv4Addresses() if self.version == 4 else self.getIPv6Addresses()
+        )
+        if not addresses:
+            raise IPSourceError("No matching interface address")
+        return addresses[0]
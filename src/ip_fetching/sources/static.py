@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from typing import Any
+import aiohttp
+
+from .abstract import IPSource
+
+
+class StaticIPSourceConfig(BaseModel):
+    address: str
+
+
+class StaticIPSource(IPSource):
+    """Fixed address, used as local stand-in for tests or hosts with a static address"""
+
+    config: StaticIPSourceConfig
+    local = True
+
+    @staticmethod
+    def validateConfig(sourceConfig: Any) -> StaticIPSourceConfig:
+        return StaticIPSourceConfig.model_validate(sourceConfig or {})
+
+    def defaultName(self) -> str:
+        return f"static {self.config.address}"
+
+    async def fetch(self, aioSession: aiohttp.ClientSession) -> str:
+        return self.config.address
@@ -1,3 +1,4 @@
-from .abstract import AsyncProvider
+from .abstract import AsyncProvider, ZoneNotFoundError
 from .hetzner import AsyncHetznerProvider
-from .providers_map import providerMap, run_all_providers
\ No newline at end of file
+from .providers_map import providerMap, discoverAddresses, runProvider
+from .scheduler import ProviderScheduler, ScheduleStats
\ No newline at end of file
@@ -1,11 +1,30 @@
 from abc import ABC, abstractmethod
 from pydantic import BaseModel, ValidationError
 from typing import Any
+import asyncio
+import hashlib
+import time
 import aiohttp
 
-from config import ProviderConfig, GlobalConfig, handleValidationError
-from ip_fetching import calculateIPv6Address
+from config import ProviderConfig, GlobalConfig, ZonesConfig, handleValidationError
 from custom_logging import Logger
+from http_sessions import SessionRegistry
+from ip_fetching import IPv6Prefix
+
+from .circuit_breaker import CircuitBreaker
+from .diff_engine import DiffEngine, RecordChange
+from .rate_limiter import RateLimiter
+from .response_cache import ResponseCache
+from .run_state import RunState
+from .retry import IDEMPOTENT_METHODS, RETRYABLE_STATUS, backoffDelay
+
+
+# `auto` fetch mode queries zones individually up to this many configured zones
+AUTO_TARGETED_MAX_ZONES = 5
+
+
+class ZoneNotFoundError(Exception):
+    """Raised if a record endpoint does not know the requested zone, e.g. due to a stale cached zone id."""
 
 
 class Record(BaseModel):
@@ -21,16 +40,19 @@ class ProviderFailCounter(BaseModel):
 
 
 class AsyncProvider(ABC):
+    api_host: str  # requests to the same host share one connection pool
     aioSession: aiohttp.ClientSession
     config: ProviderConfig[Any]
     globalConfig: GlobalConfig
-    zone_records: dict[str, dict[str, Record]] = (
-        {}
-    )  # dict[zone_id, dict[type-record_name, Record]]
-    zone_ids: dict[str, str] = {}
-    updated_zone_records: dict[str, dict[str, Record]] = {}
-    created_zone_records: dict[str, dict[str, Record]] = {}
+    zone_ids: dict[str, str]  # dict[zone_name, zone_id], cached across runs
+    zone_ids_expiry: float = 0  # unix timestamp until which zone_ids may be reused
+    runState: RunState[Record, Record, Record]
     consecutive_fail_counter: ProviderFailCounter
+    rateLimiter: RateLimiter
+    circuitBreaker: CircuitBreaker
+    diffEngine: DiffEngine
+    responseCache: ResponseCache  # listings fetched before, revalidated with conditional requests
+    retry_deadline: float | None = None  # monotonic time after which failed requests of the current run are not retried
 
     def __init__(
         self,
@@ -43,89 +65,239 @@ class AsyncProvider(ABC):
             handleValidationError(e, f"{providerConfig.provider} config")
         self.globalConfig = globalConfig
         self.consecutive_fail_counter = ProviderFailCounter()
-        self.aioSession = aiohttp.ClientSession()
+        self.zone_ids = {}
+        self.runState = RunState()
+        self.rateLimiter = RateLimiter(self.config.rate_limit)
+        self.circuitBreaker = CircuitBreaker(
+            self.config.circuit_breaker, type(self).__name__
+        )
+        self.diffEngine = DiffEngine(self.config.zones, globalConfig)
+        self.responseCache = ResponseCache(globalConfig.http.conditional_requests)
+        self.aioSession = SessionRegistry.getSession(self.api_host)
+
+    def logFields(self, **fields: Any) -> dict[str, Any]:
+        # structured fields of a log record, e.g. for the json log provider
+        return {"provider": type(self).__name__, **fields}
+
+    @staticmethod
+    def recordNames(records: list[Any]) -> list[str]:
+        return [f"{record.type}-{record.name}" for record in records]
 
     @abstractmethod
     def validateConfig(self, config: ProviderConfig[Any]) -> ProviderConfig[Any]:
         pass
         # call ProviderConfig[Specific Config Config].model_validate(self.config)
 
+    def stateKey(self) -> str:
+        # changing the provider config or record relevant global settings invalidates the cached state
+        config_hash = hashlib.sha256(
+            (
+                self.config.model_dump_json()
+                + self.globalConfig.model_dump_json(
+                    include={
+                        "ttl",
+                        "current_prefix_offset",
+                        "disable_v4",
+                        "disable_v6",
+                    }
+                )
+            ).encode()
+        ).hexdigest()
+        return f"{self.config.provider}-{config_hash[:16]}"
+
+    def __retryDelay(self, attempt: int, retry: bool) -> float | None:
+        if not retry or attempt >= self.config.retry.max_attempts:
+            return None
+        delay = backoffDelay(attempt, self.config.retry)
+        if (
+            self.retry_deadline is not None
+            and time.monotonic() + delay > self.retry_deadline
+        ):
+            return None
+        return delay
+
+    async def apiRequest(
+        self,
+        method: str,
+        url: str,
+        idempotent: bool | None = None,
+        retry: bool = True,
+        **kwargs: Any,
+    ) -> aiohttp.ClientResponse:
+        """Send a request to the provider API within its rate limit.
+
+        Requests rejected with 429 are resent after `Retry-After`. Timeouts, connection errors and 5xx responses
+        are retried with exponential backoff until the retry deadline of the current run, unless resending
+        a non idempotent request could apply it twice."""
+        logger = Logger.getDNSUpdaterLogger()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        rateLimitRetries = 0
+        attempt = 1
+        while True:
+            try:
+                async with self.rateLimiter:
+                    response = await self.aioSession.request(method, url, **kwargs)
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+                # a connection that could not be established never reached the provider
+                delay = (
+                    self.__retryDelay(attempt, retry)
+                    if idempotent or isinstance(e, aiohttp.ClientConnectorError)
+                    else None
+                )
+                if delay is None:
+                    raise
+                logger.debug(
+                    f"{type(self).__name__} {method} request failed with {type(e).__name__}, retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.rateLimiter.observe(response.status, response.headers)
+            if response.status == 429:
+                if rateLimitRetries >= self.config.rate_limit.max_retries:
+                    return response
+                response.release()
+                rateLimitRetries += 1
+                continue
+            if response.status in RETRYABLE_STATUS and idempotent:
+                delay = self.__retryDelay(attempt, retry)
+                if delay is None:
+                    return response
+                response.release()
+                logger.debug(
+                    f"{type(self).__name__} {method} request failed with status {response.status}, retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            return response
+
+    @staticmethod
+    def responseError(
+        response: aiohttp.ClientResponse, reason: str | None = None
+    ) -> aiohttp.ClientResponseError:
+        """Error of a response still failing after all retries, counted as a failed run like a timeout."""
+        response.release()
+        return aiohttp.ClientResponseError(
+            response.request_info,
+            response.history,
+            status=response.status,
+            message=reason or str(response.reason),
+            headers=response.headers,
+        )
+
+    def hasCachedZoneIds(self) -> bool:
+        return time.time() < self.zone_ids_expiry and all(
+            zone.name in self.zone_ids for zone in self.config.zones
+        )
+
+    def cacheZoneIds(self):
+        self.zone_ids_expiry = time.time() + self.globalConfig.zone_id_cache_ttl
+
+    def invalidateZoneId(self, zoneName: str):
+        self.zone_ids.pop(zoneName, None)
+        self.zone_ids_expiry = 0
+
+    def useTargetedFetch(self) -> bool:
+        match self.config.fetch_mode:
+            case "targeted":
+                return True
+            case "bulk":
+                return False
+            case _:
+                return len(self.config.zones) <= AUTO_TARGETED_MAX_ZONES
+
+    def managedRecordTypes(self) -> list[str]:
+        types: list[str] = []
+        if not self.globalConfig.disable_v4:
+            types.append("A")
+        if not self.globalConfig.disable_v6:
+            types.append("AAAA")
+        return types
+
+    @abstractmethod
+    async def probe(self) -> bool:
+        pass
+        # send a single cheap request without retries, return False if the API is still unavailable
+
     @abstractmethod
-    async def getCurrentDNSConfig(self):
+    async def getCurrentDNSConfig(self) -> bool:
         pass
+        # return False if the current config could not be (completely) fetched
+
+    @abstractmethod
+    async def getCurrentZoneConfig(self, zoneName: str, useCache: bool) -> bool:
+        pass
+        # fetch the records of a single zone, reusing its cached zone id if `useCache` is set
+
+    def recordState(self, record: Record) -> tuple[tuple[str, ...], int | None]:
+        # values and ttl of a fetched record, compared against the desired state
+        return (record.value,), record.ttl
 
-    def createDNSRecord(self, type: str, name: str, value: str, zoneName: str):
-        self.created_zone_records[self.zone_ids[zoneName]][f"{type}-{name}"] = Record(
-            ttl=self.globalConfig.ttl, name=name, value=value, type=type
+    # the default record holds a single value, providers publishing a value per active IPv6 prefix override these
+    def createDNSRecord(self, zoneName: str, change: RecordChange):
+        if not self.zone_ids[zoneName] in self.runState.created_zone_records:
+            self.runState.created_zone_records[self.zone_ids[zoneName]] = {}
+        self.runState.created_zone_records[self.zone_ids[zoneName]][
+            f"{change.type}-{change.name}"
+        ] = Record(
+            ttl=change.ttl, name=change.name, value=change.values[0], type=change.type
         )
 
-    def updateDNSRecord(self, type: str, name: str, value: str, zoneName: str):
-        temp_record = self.zone_records[self.zone_ids[zoneName]][
-            f"{type}-{name}"
-        ]
-
-        if temp_record.value == value and temp_record.ttl == self.globalConfig.ttl:
-            # skip if record value is unchanged
-            return False
-
-        temp_record.value = value
-        temp_record.ttl = self.globalConfig.ttl
-        if not self.zone_ids[zoneName] in self.updated_zone_records:
-            self.updated_zone_records[self.zone_ids[zoneName]] = {}
-        self.updated_zone_records[self.zone_ids[zoneName]][
-            f"{type}-{name}"
+    def updateDNSRecord(self, zoneName: str, change: RecordChange):
+        # keep the fetched record untouched, it is compared against when pushing the update
+        temp_record = self.runState.zone_records[self.zone_ids[zoneName]][
+            f"{change.type}-{change.name}"
+        ].model_copy(update={"value": change.values[0], "ttl": change.ttl})
+        if not self.zone_ids[zoneName] in self.runState.updated_zone_records:
+            self.runState.updated_zone_records[self.zone_ids[zoneName]] = {}
+        self.runState.updated_zone_records[self.zone_ids[zoneName]][
+            f"{change.type}-{change.name}"
         ] = temp_record
 
-    def _updateSingleDNSRecordLocally(
-        self, zoneName: str, recordName: str, type: str, value: str
-    ) -> bool:
-        if zoneName not in self.zone_ids:
-            return False
-        if f"{type}-{recordName}" in self.zone_records[self.zone_ids[zoneName]]:
-            self.updateDNSRecord(
-                type=type,
-                name=recordName,
-                value=value,
-                zoneName=zoneName,
-            )
-        else:
-            self.createDNSRecord(
-                type=type,
-                name=recordName,
-                value=value,
-                zoneName=zoneName,
-            )
-        return True
+    def updateZoneRecordsLocally(
+        self,
+        zone: ZonesConfig,
+        currentIPv4: str | None,
+        currentIPv6Prefixes: tuple[IPv6Prefix, ...] | None,
+    ):
+        if (
+            zone.name not in self.zone_ids
+            or self.zone_ids[zone.name] not in self.runState.zone_records
+        ):
+            # zone or its records could not be fetched
+            return
+        for change in self.diffEngine.diff(
+            zoneName=zone.name,
+            currentIPv4=currentIPv4,
+            currentIPv6Prefixes=currentIPv6Prefixes,
+            currentRecords=self.runState.zone_records[self.zone_ids[zone.name]],
+            recordState=self.recordState,
+        ):
+            if change.action == "create":
+                self.createDNSRecord(zoneName=zone.name, change=change)
+            else:
+                self.updateDNSRecord(zoneName=zone.name, change=change)
 
     def updateDNSRecordsLocally(
-        self, currentIPv4: str | None, currentIPv6Prefix: list[str] | None
+        self,
+        currentIPv4: str | None,
+        currentIPv6Prefixes: tuple[IPv6Prefix, ...] | None,
     ):
         for zone in self.config.zones:
-            if not self.globalConfig.disable_v4 and currentIPv4:
-                for record in zone.ipv4_records:
-                    self._updateSingleDNSRecordLocally(
-                        zoneName=zone.name,
-                        recordName=record.name,
-                        type="A",
-                        value=currentIPv4,
-                    )
-            if not self.globalConfig.disable_v6 and currentIPv6Prefix:
-                try:
-                    for record in zone.ipv6_records:
-                        self._updateSingleDNSRecordLocally(
-                            zoneName=zone.name,
-                            recordName=record.name,
-                            type="AAAA",
-                            value=calculateIPv6Address(
-                                prefix=currentIPv6Prefix,
-                                prefixOffset=record.prefixOffset,
-                                currentAddressOrFixedSuffix=record.suffix,
-                            ),
-                        )
-                except ValueError as e:
-                    # log if error when calculating ipv6 address
-                    Logger.getDNSUpdaterLogger().error(e.args[0])
+            self.updateZoneRecordsLocally(
+                zone=zone,
+                currentIPv4=currentIPv4,
+                currentIPv6Prefixes=currentIPv6Prefixes,
+            )
+
+    @abstractmethod
+    async def updateDNSConfig(self) -> bool:
+        pass
+        # return False if any record could not be updated or created
 
     @abstractmethod
-    async def updateDNSConfig(self):
+    async def updateZoneConfig(self, zoneName: str) -> bool:
         pass
+        # push the updated and created records of a single zone
@@ -0,0 +1,59 @@
+import time
+from typing import Literal
+
+from config import CircuitBreakerConfig
+from custom_logging import Logger
+
+
+class CircuitBreaker(object):
+    """Stops calling a provider API that keeps failing, until a single probe request succeeds again.
+
+    closed: runs call the API as usual, `failure_threshold` consecutive failed runs open the circuit.
+    open: runs are skipped until `cooldown` passed, then the circuit is half-open.
+    half-open: the next run probes the API first, a failed probe opens the circuit again with a doubled cooldown."""
+
+    config: CircuitBreakerConfig
+    name: str
+    state: Literal["closed", "open", "half-open"]
+    opened_at: float
+    cooldown: float
+
+    def __init__(self, config: CircuitBreakerConfig, name: str):
+        self.config = config
+        self.name = name
+        self.state = "closed"
+        self.opened_at = 0
+        self.cooldown = config.cooldown
+
+    def allowRun(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.state = "half-open"
+        return True
+
+    def __open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+
+    def probeFailed(self):
+        self.cooldown = min(self.cooldown * 2, self.config.max_cooldown)
+        self.__open()
+        Logger.getDNSUpdaterLogger().debug(
+            f"{self.name} is still unavailable, next probe in {self.cooldown:.0f}s"
+        )
+
+    def update(self, consecutiveFails: int):
+        """Track the outcome of a run, given the consecutive failures of the provider."""
+        logger = Logger.getDNSUpdaterLogger()
+        if consecutiveFails >= self.config.failure_threshold:
+            if self.state != "open":
+                if self.state == "closed":
+                    logger.warning(
+                        f"{self.name} failed {consecutiveFails} time(s) in a row, pausing API calls for {self.cooldown:.0f}s"
+                    )
+                self.__open()
+        elif consecutiveFails == 0 and self.state != "closed":
+            logger.info(f"{self.name} is available again, resuming API calls")
+            self.state = "closed"
+            self.cooldown = self.config.cooldown
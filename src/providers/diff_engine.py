@@ -0,0 +1,129 @@
+from typing import Callable, Literal, NamedTuple, TypeVar
+
+from config import GlobalConfig, ZonesConfig
+from ip_fetching import IPv6Prefix, deriveIPv6Addresses, parseIPv6Suffix, parsePrefixOffset
+from custom_logging import Logger
+
+CurrentRecord = TypeVar("CurrentRecord")
+
+
+class RecordChange(NamedTuple):
+    action: Literal["create", "update", "ttl"]  # ttl: only the ttl differs, the values are up to date
+    type: str
+    name: str
+    values: tuple[str, ...]  # sorted, one per active IPv6 prefix for AAAA records
+    ttl: int
+
+
+class ConfiguredRecord(NamedTuple):
+    key: str  # type-record_name, as used by the provider zone_records
+    type: str
+    name: str
+    prefixOffset: int = 0  # AAAA records only, parsed from the config once
+    suffix: int = 0
+
+
+class DiffEngine(object):
+    """Desired state of all configured records and its diff against the records fetched from a provider.
+
+    The record index is built once from the config, the desired values are only recomputed when the
+    IPv4 address or the active IPv6 prefixes change, the addresses of a record in all prefixes are derived
+    in one pass. Diffing a zone then is a dict lookup per configured record."""
+
+    ttl: int
+    _records: dict[str, list[ConfiguredRecord]]  # dict[zone_name, configured records]
+    _keys: dict[str, frozenset[str]]  # dict[zone_name, keys of the configured records]
+    _inputs: tuple[str | None, tuple[IPv6Prefix, ...] | None] | None
+    _desired: dict[str, dict[str, tuple[str, ...]]]  # dict[zone_name, dict[type-record_name, sorted values]]
+
+    def __init__(self, zones: list[ZonesConfig], globalConfig: GlobalConfig):
+        self.ttl = globalConfig.ttl
+        self._records = {}
+        for zone in zones:
+            records: list[ConfiguredRecord] = []
+            if not globalConfig.disable_v4:
+                records.extend(
+                    ConfiguredRecord(key=f"A-{record.name}", type="A", name=record.name)
+                    for record in zone.ipv4_records
+                )
+            if not globalConfig.disable_v6:
+                records.extend(
+                    ConfiguredRecord(
+                        key=f"AAAA-{record.name}",
+                        type="AAAA",
+                        name=record.name,
+                        prefixOffset=parsePrefixOffset(record.prefixOffset),
+                        suffix=parseIPv6Suffix(record.suffix),
+                    )
+                    for record in zone.ipv6_records
+                )
+            self._records[zone.name] = records
+        self._keys = {
+            zoneName: frozenset(record.key for record in records)
+            for zoneName, records in self._records.items()
+        }
+        self._inputs = None
+        self._desired = {}
+
+    def __refresh(
+        self, currentIPv4: str | None, currentIPv6Prefixes: tuple[IPv6Prefix, ...] | None
+    ):
+        inputs = (currentIPv4 or None, currentIPv6Prefixes or None)
+        if inputs == self._inputs:
+            return
+        ipv4Values = (currentIPv4,)
+        desired: dict[str, dict[str, tuple[str, ...]]] = {}
+        for zoneName, records in self._records.items():
+            zoneDesired: dict[str, tuple[str, ...]] = {}
+            for record in records:
+                if record.type == "A":
+                    if currentIPv4:
+                        zoneDesired[record.key] = ipv4Values
+                    continue
+                if not currentIPv6Prefixes:
+                    continue
+                try:
+                    zoneDesired[record.key] = deriveIPv6Addresses(
+                        currentIPv6Prefixes, record.prefixOffset, record.suffix
+                    )
+                except ValueError as e:
+                    # log if error when calculating ipv6 address
+                    Logger.getDNSUpdaterLogger().error(e.args[0])
+            desired[zoneName] = zoneDesired
+        self._desired = desired
+        self._inputs = inputs
+
+    def recordKeys(self, zoneName: str) -> frozenset[str]:
+        """Keys (type-record_name) of the records configured in a zone, other fetched records can be dropped."""
+        return self._keys.get(zoneName, frozenset())
+
+    def diff(
+        self,
+        zoneName: str,
+        currentIPv4: str | None,
+        currentIPv6Prefixes: tuple[IPv6Prefix, ...] | None,
+        currentRecords: dict[str, CurrentRecord],
+        recordState: Callable[[CurrentRecord], tuple[tuple[str, ...], int | None]],
+    ) -> list[RecordChange]:
+        """Changes needed to bring `currentRecords` of a zone to the desired state.
+
+        `recordState` maps a provider record to its values and ttl."""
+        self.__refresh(currentIPv4, currentIPv6Prefixes)
+        desired = self._desired.get(zoneName, {})
+        ttl = self.ttl
+        changes: list[RecordChange] = []
+        for record in self._records.get(zoneName, []):
+            values = desired.get(record.key)
+            if values is None:
+                # no address of this family or its calculation failed
+                continue
+            current = currentRecords.get(record.key)
+            if current is None:
+                changes.append(RecordChange("create", record.type, record.name, values, ttl))
+                continue
+            currentValues, currentTTL = recordState(current)
+            if currentValues != values and tuple(sorted(currentValues)) != values:
+                changes.append(RecordChange("update", record.type, record.name, values, ttl))
+            elif currentTTL != ttl:
+                changes.append(RecordChange("ttl", record.type, record.name, values, ttl))
+        return changes
@@ -39,6 +39,15 @@ class HetznerZones(BaseModel):
     zones: list[HetznerZone]
     meta: HetznerZonesMeta
 
+# projection of the zone listing, only the fields used to resolve zone ids are validated, the others are ignored
+class HetznerZoneSummary(BaseModel):
+    id: str
+    name: str
+
+class HetznerZoneSummaries(BaseModel):
+    zones: list[HetznerZoneSummary]
+    meta: HetznerZonesMeta
+
 class HetznerRecord(Record):
     id: str | None = None # not part of post, put, bulk post
     created: str | None = None # not part of post, put, bulk post and put
@@ -46,4 +55,5 @@ class HetznerRecord(Record):
     zone_id: str
 
 class HetznerRecords(BaseModel):
-    records: list[HetznerRecord]
\ No newline at end of file
+    records: list[HetznerRecord]
+    meta: HetznerZonesMeta | None = None # only returned for paginated requests
\ No newline at end of file
@@ -1,3 +1,4 @@
+import asyncio
 import json
 from pydantic import BaseModel, ValidationError
 from typing import Any
@@ -5,137 +6,418 @@ from typing import Any
 import aiohttp
 
 from config.config_models import ProviderConfig
+from custom_logging import LazyJSON
 from custom_logging.logger import Logger
-from providers import AsyncProvider
+from providers import AsyncProvider, ZoneNotFoundError
+from providers.diff_engine import RecordChange
+from providers.json_stream import JSONArrayStream
+from providers.pagination import fetchAllPages
+from providers.run_state import RunState
 
 from .api_pydantic_models import *
 
+# page sizes of the zone and record listings, kept large to minimize the request count
+ZONES_PER_PAGE = 100
+RECORDS_PER_PAGE = 1000
+
 
 class HetznerProviderConfigConfig(BaseModel):
     api_token: str
 
 
 class AsyncHetznerProvider(AsyncProvider):
+    api_host = "dns.hetzner.com"
     config: ProviderConfig[HetznerProviderConfigConfig]
-    zone_records: dict[str, dict[str, HetznerRecord]] = {}
-    updated_zone_records: dict[str, dict[str, HetznerRecord]] = {}
-    created_zone_records: dict[str, dict[str, HetznerRecord]] = {}
+    # zone_records hold one record per value, updated and deleted records are keyed by record id,
+    # created records by type-record_name-value
+    runState: RunState[list[HetznerRecord], HetznerRecord, HetznerRecord]
 
     def validateConfig(self, config: ProviderConfig[Any]) -> ProviderConfig[Any]:
         return ProviderConfig[HetznerProviderConfigConfig].model_validate(config)
 
-    async def getCurrentDNSConfig(self):
-        api_token: str = self.config.provider_config.api_token
+    async def __getZonesPage(
+        self, page: int, apiTimeout: aiohttp.ClientTimeout, name: str | None = None
+    ) -> HetznerZoneSummaries | None:
         logger = Logger.getDNSUpdaterLogger()
-        globalConfig = self.globalConfig
-
-        apiTimeout = aiohttp.ClientTimeout(total=10)
-        # TODO: pagination handling
-        getZones = await self.aioSession.get(
+        params: dict[str, str | int] = {"page": page, "per_page": ZONES_PER_PAGE}
+        if name is not None:
+            params["name"] = name
+        cacheKey = self.responseCache.key("https://dns.hetzner.com/api/v1/zones", params)
+        getZones = await self.apiRequest(
+            "GET",
             url="https://dns.hetzner.com/api/v1/zones",
             headers={
-                "Auth-API-Token": api_token,
+                "Auth-API-Token": self.config.provider_config.api_token,
+                **self.responseCache.conditionalHeaders(cacheKey),
             },
+            params=params,
             timeout=apiTimeout,
         )
 
+        if getZones.status == 304:
+            getZones.release()
+            cached = self.responseCache.get(cacheKey)
+            if cached is None:
+                logger.error("Get Hetzner Zones - Not Modified, but the response is no longer cached")
+                return None
+            return cached
         if getZones.status != 200:
             match getZones.status:
                 case 400:
-                    logger.error(
-                        "Get Hetzner Zones - Pagination selectors are mutually exclusive",
-                    )
-                    return
-                case 401:
-                    logger.error(
-                        f"Get Hetzner Zones - {getZones.reason}",
+                    raise self.responseError(
+                        getZones, "Pagination selectors are mutually exclusive"
                     )
-                    return
-                case 406:
+                case 404 if name is not None:
                     logger.error(
-                        f"Get Hetzner Zones - {getZones.reason}",
+                        f"Get Hetzner Zones - Zone {name} {getZones.reason}",
                     )
-                    return
+                    return None
+                case 429:
+                    raise self.responseError(getZones, "Rate limit exceeded")
+                case _:
+                    raise self.responseError(getZones)
         try:
-            zones: HetznerZones = HetznerZones.model_validate(await getZones.json())
-            for entry in zones.zones:
-                self.zone_records[entry.id] = {}
-                self.zone_ids[entry.name] = entry.id
+            # validate the raw body, no intermediate dicts of the whole listing
+            zones = HetznerZoneSummaries.model_validate_json(await getZones.read())
+            self.responseCache.store(cacheKey, getZones.headers, zones)
+            return zones
         except ValidationError as e:
             logger.error(
                 f"Hetzner Zones Endpoint responded with invalid Response Body:\n```{(await getZones.text())}```",
             )
             raise e
 
-        getRecords = await self.aioSession.get(
+    async def __getRecordsPage(
+        self,
+        page: int,
+        apiTimeout: aiohttp.ClientTimeout,
+        zoneId: str | None = None,
+        listedZoneIds: set[str] | None = None,
+    ) -> HetznerRecords | None:
+        """Fetch a page of records, keeping only the configured records.
+
+        The body is decoded while it arrives and records of other types or names are dropped right away,
+        the ids of all zones listed are collected in `listedZoneIds`."""
+        logger = Logger.getDNSUpdaterLogger()
+        params: dict[str, str | int] = {"page": page, "per_page": RECORDS_PER_PAGE}
+        if zoneId is not None:
+            params["zone_id"] = zoneId
+        recordKeys = {
+            self.zone_ids[zone.name]: self.diffEngine.recordKeys(zone.name)
+            for zone in self.config.zones
+            if zone.name in self.zone_ids
+            and (zoneId is None or self.zone_ids[zone.name] == zoneId)
+        }
+        # the kept records depend on the ids of the configured zones listed, only the requested one if filtered
+        cacheKey = self.responseCache.key(
+            "https://dns.hetzner.com/api/v1/records", params, ",".join(sorted(recordKeys))
+        )
+        getRecords = await self.apiRequest(
+            "GET",
             url="https://dns.hetzner.com/api/v1/records",
             headers={
-                "Auth-API-Token": api_token,
+                "Auth-API-Token": self.config.provider_config.api_token,
+                **self.responseCache.conditionalHeaders(cacheKey),
             },
+            params=params,
             timeout=apiTimeout,  # wait longer for bigger responses in case of a lot of records
         )
+        if getRecords.status == 304:
+            getRecords.release()
+            cached = self.responseCache.get(cacheKey)
+            if cached is None:
+                logger.error("Get Hetzner Records - Not Modified, but the response is no longer cached")
+                return None
+            recordsPage, listed = cached
+            if listedZoneIds is not None:
+                listedZoneIds.update(listed)
+            return recordsPage
         if getRecords.status != 200:
             match getRecords.status:
-                case 401:
-                    logger.error(
-                        f"Get Hetzner Zones - {getRecords.reason}",
-                    )
-                    return
-                case 406:
-                    logger.error(
-                        f"Get Hetzner Zones - {getRecords.reason}",
-                    )
-                    return
+                case 404 if zoneId is not None:
+                    raise ZoneNotFoundError(zoneId)
+                case 429:
+                    raise self.responseError(getRecords, "Rate limit exceeded")
+                case _:
+                    # never parse an error body as an empty listing, the records would be created again
+                    raise self.responseError(getRecords)
+        stream = JSONArrayStream("records")
+        records: list[Any] = []
+        listed: set[str] = set()
         try:
-            records: HetznerRecords = HetznerRecords.model_validate(
-                await getRecords.json()
-            )
-            for entry in records.records:
-                if (entry.type == "A" and not globalConfig.disable_v4) or (
-                    entry.type == "AAAA" and not globalConfig.disable_v6
+            async for entry in stream.items(getRecords.content):
+                if not isinstance(entry, dict):
+                    # left to the validation below
+                    records.append(entry)
+                    continue
+                listed.add(entry.get("zone_id"))
+                if f"{entry.get("type")}-{entry.get("name")}" in recordKeys.get(
+                    entry.get("zone_id"), ()
                 ):
-                    self.zone_records[entry.zone_id][
-                        entry.type + "-" + entry.name
-                    ] = entry
-        except ValidationError as e:
+                    records.append(entry)
+            recordsPage = HetznerRecords.model_validate({**stream.fields, "records": records})
+            self.responseCache.store(cacheKey, getRecords.headers, (recordsPage, frozenset(listed)))
+            if listedZoneIds is not None:
+                listedZoneIds.update(listed)
+            return recordsPage
+        except ValueError as e:
+            # invalid json or records
             logger.error(
                 "Hetzner Records Endpoint responded with invalid Response Body",
             )
             raise e
+        finally:
+            getRecords.release()
+
+    @staticmethod
+    def _lastPage(page: HetznerZoneSummaries | HetznerRecords) -> int | None:
+        if page.meta is None:
+            # unpaginated response
+            return 1
+        return page.meta.pagination.last_page
+
+    def __storeRecords(self, recordPages: list[HetznerRecords]):
+        # the pages only hold the configured records
+        for records in recordPages:
+            for entry in records.records:
+                if entry.zone_id in self.runState.zone_records:
+                    # the api holds one record per value, e.g. per active IPv6 prefix
+                    self.runState.zone_records[entry.zone_id].setdefault(
+                        entry.type + "-" + entry.name, []
+                    ).append(entry)
+
+    async def __lookupZoneId(
+        self, zoneName: str, apiTimeout: aiohttp.ClientTimeout
+    ) -> str | None:
+        zones = await self.__getZonesPage(1, apiTimeout, name=zoneName)
+        if zones is None:
+            return None
+        if len(zones.zones) == 0:
+            Logger.getDNSUpdaterLogger().error(
+                f"Get Hetzner Records for Zone {zoneName} failed: Zone not found in Hetzner Zones"
+            )
+            return None
+        self.zone_ids[zones.zones[0].name] = zones.zones[0].id
+        return zones.zones[0].id
+
+    async def __getZoneRecords(
+        self, zoneId: str, apiTimeout: aiohttp.ClientTimeout
+    ) -> bool:
+        recordPages = await fetchAllPages(
+            fetchPage=lambda page: self.__getRecordsPage(
+                page, apiTimeout, zoneId=zoneId
+            ),
+            lastPage=self._lastPage,
+            nextPage=lambda page: None,
+        )
+        if recordPages is None:
+            return False
+        self.runState.zone_records[zoneId] = {}
+        self.__storeRecords(recordPages)
+        return True
+
+    async def getCurrentZoneConfig(self, zoneName: str, useCache: bool) -> bool:
+        apiTimeout = aiohttp.ClientTimeout(total=10)
+        zoneId = self.zone_ids.get(zoneName) if useCache else None
+        if zoneId is not None:
+            try:
+                return await self.__getZoneRecords(zoneId, apiTimeout)
+            except ZoneNotFoundError:
+                # cached zone id is stale, resolve it again
+                Logger.getDNSUpdaterLogger().debug(
+                    f"Cached Hetzner Zone ID of {zoneName} is stale"
+                )
+                self.invalidateZoneId(zoneName)
+        zoneId = await self.__lookupZoneId(zoneName, apiTimeout)
+        if zoneId is None:
+            return False
+        try:
+            return await self.__getZoneRecords(zoneId, apiTimeout)
+        except ZoneNotFoundError:
+            Logger.getDNSUpdaterLogger().error(
+                f"Get Hetzner Records for Zone {zoneName} failed: Zone not found"
+            )
+            self.invalidateZoneId(zoneName)
+            return False
+
+    async def probe(self) -> bool:
+        probeResponse = await self.apiRequest(
+            "GET",
+            url="https://dns.hetzner.com/api/v1/zones",
+            retry=False,
+            headers={
+                "Auth-API-Token": self.config.provider_config.api_token,
+            },
+            params={"page": 1, "per_page": 1},
+            timeout=aiohttp.ClientTimeout(total=5),
+        )
+        probeResponse.release()
+        return probeResponse.status < 500 and probeResponse.status != 429
+
+    async def getCurrentDNSConfig(self) -> bool:
+        apiTimeout = aiohttp.ClientTimeout(total=10)
+        useCache = self.hasCachedZoneIds()
+        if not useCache:
+            self.zone_ids = {}
 
-    def createDNSRecord(self, type: str, name: str, value: str, zoneName: str):
-        if not self.zone_ids[zoneName] in self.created_zone_records:
-            self.created_zone_records[self.zone_ids[zoneName]] = {}
-        self.created_zone_records[self.zone_ids[zoneName]][f"{type}-{name}"] = (
-            HetznerRecord(
-                ttl=self.globalConfig.ttl,
-                name=name,
+        if self.useTargetedFetch():
+            # only query the configured zones instead of listing the whole account
+            results = await asyncio.gather(
+                *[
+                    self.getCurrentZoneConfig(zone.name, useCache)
+                    for zone in self.config.zones
+                ],
+                return_exceptions=False,
+            )
+            if not useCache and all(results):
+                self.cacheZoneIds()
+            return all(results)
+
+        if not useCache:
+            zonePages = await fetchAllPages(
+                fetchPage=lambda page: self.__getZonesPage(page, apiTimeout),
+                lastPage=self._lastPage,
+                nextPage=lambda page: None,
+            )
+            if zonePages is None:
+                return False
+            for zones in zonePages:
+                for entry in zones.zones:
+                    self.zone_ids[entry.name] = entry.id
+            self.cacheZoneIds()
+
+        listedZoneIds: set[str] = set()
+        recordPages = await fetchAllPages(
+            fetchPage=lambda page: self.__getRecordsPage(
+                page, apiTimeout, listedZoneIds=listedZoneIds
+            ),
+            lastPage=self._lastPage,
+            nextPage=lambda page: None,
+        )
+        if recordPages is None:
+            return False
+        # zones are only indexed once their records were fetched, missing records would be created again
+        for zoneId in self.zone_ids.values():
+            self.runState.zone_records[zoneId] = {}
+        if useCache:
+            # every existing zone lists at least its SOA and NS records
+            staleZones = [
+                zone.name
+                for zone in self.config.zones
+                if zone.name in self.zone_ids
+                and self.zone_ids[zone.name] not in listedZoneIds
+            ]
+            if len(staleZones) > 0:
+                Logger.getDNSUpdaterLogger().debug(
+                    f"Cached Hetzner Zone IDs of {", ".join(staleZones)} are stale"
+                )
+                for zoneName in staleZones:
+                    self.invalidateZoneId(zoneName)
+        self.__storeRecords(recordPages)
+        return self.hasCachedZoneIds() or not useCache
+
+    def recordState(
+        self, records: list[HetznerRecord]
+    ) -> tuple[tuple[str, ...], int | None]:
+        ttls = set(record.ttl for record in records)
+        return tuple(record.value for record in records), (
+            ttls.pop() if len(ttls) == 1 else None
+        )
+
+    def createDNSRecord(self, zoneName: str, change: RecordChange):
+        zoneId = self.zone_ids[zoneName]
+        if not zoneId in self.runState.created_zone_records:
+            self.runState.created_zone_records[zoneId] = {}
+        for value in change.values:
+            self.runState.created_zone_records[zoneId][
+                f"{change.type}-{change.name}-{value}"
+            ] = HetznerRecord(
+                ttl=change.ttl,
+                name=change.name,
                 value=value,
-                type=type,
-                zone_id=self.zone_ids[zoneName],
+                type=change.type,
+                zone_id=zoneId,
             )
+
+    def updateDNSRecord(self, zoneName: str, change: RecordChange):
+        # records already holding a desired value are kept, the others are reused for the missing values,
+        # surplus records are deleted and missing values left over are created
+        zoneId = self.zone_ids[zoneName]
+        records = self.runState.zone_records[zoneId][f"{change.type}-{change.name}"]
+        kept = set(record.value for record in records if record.value in change.values)
+        missing = [value for value in change.values if value not in kept]
+        updated = self.runState.updated_zone_records.setdefault(zoneId, {})
+        for record in records:
+            if record.value in kept:
+                kept.discard(record.value)
+                if record.ttl != change.ttl:
+                    updated[str(record.id)] = record.model_copy(update={"ttl": change.ttl})
+            elif len(missing) > 0:
+                updated[str(record.id)] = record.model_copy(
+                    update={"value": missing.pop(0), "ttl": change.ttl}
+                )
+            else:
+                self.runState.deleted_zone_records.setdefault(zoneId, {})[str(record.id)] = record
+        if len(missing) > 0:
+            self.createDNSRecord(zoneName, change._replace(values=tuple(missing)))
+
+    async def updateDNSConfig(self) -> bool:
+        return await self.__pushRecords(
+            updated_zone_records=[
+                record
+                for zone in self.runState.updated_zone_records.values()
+                for record in zone.values()
+            ],
+            created_zone_records=[
+                record
+                for zone in self.runState.created_zone_records.values()
+                for record in zone.values()
+            ],
+            deleted_zone_records=[
+                record
+                for zone in self.runState.deleted_zone_records.values()
+                for record in zone.values()
+            ],
+        )
+
+    async def updateZoneConfig(self, zoneName: str) -> bool:
+        zoneId = self.zone_ids[zoneName]
+        return await self.__pushRecords(
+            updated_zone_records=list(
+                self.runState.updated_zone_records.get(zoneId, {}).values()
+            ),
+            created_zone_records=list(
+                self.runState.created_zone_records.get(zoneId, {}).values()
+            ),
+            deleted_zone_records=list(
+                self.runState.deleted_zone_records.get(zoneId, {}).values()
+            ),
         )
 
-    async def updateDNSConfig(self):
+    async def __pushRecords(
+        self,
+        updated_zone_records: list[HetznerRecord],
+        created_zone_records: list[HetznerRecord],
+        deleted_zone_records: list[HetznerRecord],
+    ) -> bool:
         api_token: str = self.config.provider_config.api_token
         logger = Logger.getDNSUpdaterLogger()
         globalConfig = self.globalConfig
 
         apiTimeout = aiohttp.ClientTimeout(total=10)
+        all_applied = True
 
-        updated_zone_records = [
-            record
-            for zone in self.updated_zone_records.values()
-            for record in zone.values()
-        ]
         if globalConfig.dry_run:
             logger.info(
-                f"These Records would be updated:\n```{json.dumps(
-                    [record.model_dump() for record in updated_zone_records]
-                )}```"
+                "These Records would be updated:\n```%s```",
+                LazyJSON(lambda: [record.model_dump() for record in updated_zone_records]),
+                extra=self.logFields(
+                    action="update", record=self.recordNames(updated_zone_records)
+                ),
             )
         elif len(updated_zone_records) > 0:
-            updateResponse = await self.aioSession.put(
+            updateResponse = await self.apiRequest(
+                "PUT",
                 url="https://dns.hetzner.com/api/v1/records/bulk",
                 headers={
                     "Content-Type": "application/json",
@@ -152,6 +434,7 @@ class AsyncHetznerProvider(AsyncProvider):
             )
 
             if updateResponse.status != 200:
+                all_applied = False
                 match updateResponse.status:
                     case 401:
                         logger.error(
@@ -169,23 +452,32 @@ class AsyncHetznerProvider(AsyncProvider):
                         logger.error(
                             "Update Hetzner Records Error - Unprocessable entity",
                         )
+                    case 429:
+                        logger.error(
+                            "Update Hetzner Records Error - Rate limit exceeded",
+                        )
             else:
                 # TODO: validate response using pydantic?
+                updatedRecords = (await updateResponse.json())["records"]
                 logger.info(
-                    f"These Records were updated:\n```{json.dumps((await updateResponse.json())["records"])}```"
+                    "These Records were updated:\n```%s```",
+                    LazyJSON(lambda: updatedRecords),
+                    extra=self.logFields(
+                        action="update", record=self.recordNames(updated_zone_records)
+                    ),
                 )
 
-        created_zone_records = [
-            record
-            for zone in self.created_zone_records.values()
-            for record in zone.values()
-        ]
         if globalConfig.dry_run:
             logger.info(
-                f"These Records would be created:\n```{json.dumps([record.model_dump() for record in created_zone_records])}```"
+                "These Records would be created:\n```%s```",
+                LazyJSON(lambda: [record.model_dump() for record in created_zone_records]),
+                extra=self.logFields(
+                    action="create", record=self.recordNames(created_zone_records)
+                ),
             )
         elif len(created_zone_records) > 0:
-            createResponse = await self.aioSession.post(
+            createResponse = await self.apiRequest(
+                "POST",
                 url="https://dns.hetzner.com/api/v1/records/bulk",
                 headers={
                     "Content-Type": "application/json",
@@ -202,6 +494,7 @@ class AsyncHetznerProvider(AsyncProvider):
             )
 
             if createResponse.status != 200:
+                all_applied = False
                 match createResponse.status:
                     case 401:
                         logger.error(
@@ -227,8 +520,82 @@ class AsyncHetznerProvider(AsyncProvider):
                         logger.error(
                             "Create Hetzner Records Error - Unprocessable entity",
                         )
+                    case 429:
+                        logger.error(
+                            "Create Hetzner Records Error - Rate limit exceeded",
+                        )
             else:
                 # TODO: validate response using pydantic?
+                createdRecords = (await createResponse.json())["records"]
+                logger.info(
+                    "These Records were created:\n```%s```",
+                    LazyJSON(lambda: createdRecords),
+                    extra=self.logFields(
+                        action="create", record=self.recordNames(created_zone_records)
+                    ),
+                )
+
+        if globalConfig.dry_run:
+            if len(deleted_zone_records) > 0:
+                logger.info(
+                    "These Records would be deleted:\n```%s```",
+                    LazyJSON(lambda: [record.model_dump() for record in deleted_zone_records]),
+                    extra=self.logFields(
+                        action="delete", record=self.recordNames(deleted_zone_records)
+                    ),
+                )
+        elif len(deleted_zone_records) > 0:
+            # values of prefixes that are no longer active, the api has no bulk delete
+            deleted = await asyncio.gather(
+                *[
+                    self.__deleteRecord(record, apiTimeout)
+                    for record in deleted_zone_records
+                ]
+            )
+            if not all(deleted):
+                all_applied = False
+            deletedRecords = [
+                record
+                for record, success in zip(deleted_zone_records, deleted)
+                if success
+            ]
+            if len(deletedRecords) > 0:
                 logger.info(
-                    f"These Records were created:\n```{json.dumps((await createResponse.json())["records"])}```"
+                    "These Records were deleted:\n```%s```",
+                    LazyJSON(lambda: [record.model_dump() for record in deletedRecords]),
+                    extra=self.logFields(
+                        action="delete", record=self.recordNames(deletedRecords)
+                    ),
+                )
+        return all_applied
+
+    async def __deleteRecord(
+        self, record: HetznerRecord, apiTimeout: aiohttp.ClientTimeout
+    ) -> bool:
+        logger = Logger.getDNSUpdaterLogger()
+        deleteResponse = await self.apiRequest(
+            "DELETE",
+            url=f"https://dns.hetzner.com/api/v1/records/{record.id}",
+            headers={
+                "Auth-API-Token": self.config.provider_config.api_token,
+            },
+            timeout=apiTimeout,
+        )
+        deleteResponse.release()
+        match deleteResponse.status:
+            case 200 | 404:
+                # already deleted records are fine
+                return True
+            case 401:
+                logger.error(
+                    f"Delete Hetzner Record Error - {deleteResponse.reason}",
+                )
+            case 406:
+                logger.error(
+                    f"Delete Hetzner Record Error - {deleteResponse.reason}",
+                )
+            case 429:
+                logger.error(
+                    "Delete Hetzner Record Error - Rate limit exceeded",
                 )
+        return False
@@ -54,6 +54,15 @@ class HetznerCloudZones(BaseModel):
     zones: list[HetznerCloudZone]
     meta: HetznerCloudZonesMeta
 
+# projection of the zone listing, only the fields used to resolve zone ids are validated, the others are ignored
+class HetznerCloudZoneSummary(BaseModel):
+    id: int
+    name: str
+
+class HetznerCloudZoneSummaries(BaseModel):
+    zones: list[HetznerCloudZoneSummary]
+    meta: HetznerCloudZonesMeta
+
 class HetznerCloudRRSetRecord(BaseModel):
     value: str
     comment: str | None = None
@@ -77,4 +86,17 @@ class CreateHetznerCloudRRSet(BaseModel):
 
 class HetznerCloudRecords(BaseModel):
     rrsets: list[HetznerCloudRRSet]
-    meta: HetznerCloudZonesMeta
\ No newline at end of file
+    meta: HetznerCloudZonesMeta
+class HetznerCloudActionError(BaseModel):
+    code: str
+    message: str
+
+class HetznerCloudAction(BaseModel):
+    id: int
+    command: str
+    status: Literal["running", "success", "error"]
+    progress: int
+    error: HetznerCloudActionError | None = None
+
+class HetznerCloudActionResponse(BaseModel):
+    action: HetznerCloudAction
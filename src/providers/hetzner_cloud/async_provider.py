@@ -8,153 +8,323 @@ from urllib.parse import quote
 import aiohttp
 
 from config.config_models import ProviderConfig
+from custom_logging import LazyJSON
 from custom_logging.logger import Logger
-from providers import AsyncProvider
+from providers import AsyncProvider, ZoneNotFoundError
+from providers.diff_engine import RecordChange
+from providers.json_stream import JSONArrayStream
+from providers.pagination import fetchAllPages
+from providers.run_state import RunState
 
 from .api_pydantic_models import *
+from .zonefile import ZonefileParseError, replaceRRSets
+
+# maximum page size of the Hetzner Cloud API
+PER_PAGE = 50
+# seconds between polls of a running action, and until an action that is still running counts as failed
+ACTION_POLL_INTERVAL = 1
+ACTION_TIMEOUT = 60
 
 
 class HetznerCloudProviderConfigConfig(BaseModel):
     api_token: str
+    zonefile_import_threshold: int = 25  # changed rrsets of a zone from which on the zone file is imported at once, 0 disables
 
 
 class AsyncHetznerCloudProvider(AsyncProvider):
+    api_host = "api.hetzner.cloud"
     config: ProviderConfig[HetznerCloudProviderConfigConfig]
-    zone_records: dict[str, dict[str, HetznerCloudRRSet]] = {}
-    updated_zone_records: dict[str, dict[str, HetznerCloudRRSet]] = {}
-    created_zone_records: dict[str, dict[str, CreateHetznerCloudRRSet]] = {}
+    runState: RunState[HetznerCloudRRSet, HetznerCloudRRSet, CreateHetznerCloudRRSet]
 
     def validateConfig(self, config: ProviderConfig[Any]) -> ProviderConfig[Any]:
         return ProviderConfig[HetznerCloudProviderConfigConfig].model_validate(config)
 
-    async def __getZoneRecords(self, zone: str, apiTimeout: aiohttp.ClientTimeout):
+    def __recordFilterParams(self, zone: str) -> list[tuple[str, str]]:
+        # let the API drop all record types and, if possible, names we don't manage
+        params = [("type", type) for type in self.managedRecordTypes()]
+        names = {
+            record.name
+            for zoneConfig in self.config.zones
+            if zoneConfig.name == zone
+            for record in [*zoneConfig.ipv4_records, *zoneConfig.ipv6_records]
+        }
+        if len(names) == 1:
+            # the name filter only accepts a single name
+            params.append(("name", names.pop()))
+        return params
+
+    async def __getZoneRecordsPage(
+        self, zone: str, zoneId: str, page: int, apiTimeout: aiohttp.ClientTimeout
+    ) -> HetznerCloudRecords | None:
+        """Fetch a page of rrsets, keeping only the configured records.
+
+        The body is decoded while it arrives and rrsets of other types or names are dropped right away."""
         logger = Logger.getDNSUpdaterLogger()
-        zone_encoded = quote(zone)
-        getRecords = await self.aioSession.get(
+        zone_encoded = quote(zoneId)
+        params: list[tuple[str, str | int]] = [("page", page), ("per_page", PER_PAGE)]
+        if self.useTargetedFetch():
+            params.extend(self.__recordFilterParams(zone))
+        cacheKey = self.responseCache.key(
+            f"https://api.hetzner.cloud/v1/zones/{zone_encoded}/rrsets", params
+        )
+        getRecords = await self.apiRequest(
+            "GET",
             url=f"https://api.hetzner.cloud/v1/zones/{zone_encoded}/rrsets",
             headers={
                 "Authorization": f"Bearer {self.config.provider_config.api_token}",
+                **self.responseCache.conditionalHeaders(cacheKey),
             },
+            params=params,
             timeout=apiTimeout,  # wait longer for bigger responses in case of a lot of records
         )
+        if getRecords.status == 304:
+            getRecords.release()
+            cached = self.responseCache.get(cacheKey)
+            if cached is None:
+                logger.error("Get Hetzner Records - Not Modified, but the response is no longer cached")
+                return None
+            return cached
         if getRecords.status >= 400:
             match getRecords.status:
-                case 401:
-                    logger.error(f"Get Hetzner Records - {getRecords.reason}")
-                    return
-                case 406:
-                    logger.error(f"Get Hetzner Records - {getRecords.reason}")
-                    return
+                case 404:
+                    raise ZoneNotFoundError(zoneId)
+                case 429:
+                    raise self.responseError(getRecords, "Rate limit exceeded")
                 case _:
-                    logger.error(
-                        f"Get Hetzner Records - Unknown Error Code {getRecords.status}"
-                    )
-                    return
+                    raise self.responseError(getRecords)
+        recordKeys = self.diffEngine.recordKeys(zone)
+        stream = JSONArrayStream("rrsets")
+        rrsets: list[Any] = []
         try:
-            records: HetznerCloudRecords = HetznerCloudRecords.model_validate(
-                await getRecords.json()
-            )
-            for entry in records.rrsets:
-                if (entry.type == "A" and not self.globalConfig.disable_v4) or (
-                    entry.type == "AAAA" and not self.globalConfig.disable_v6
+            async for entry in stream.items(getRecords.content):
+                if (
+                    not isinstance(entry, dict)
+                    or f"{entry.get("type")}-{entry.get("name")}" in recordKeys
                 ):
-                    self.zone_records[str(entry.zone)][entry.type + "-" + entry.name] = entry
-        except ValidationError as e:
+                    # invalid entries are left to the validation below
+                    rrsets.append(entry)
+            records = HetznerCloudRecords.model_validate({**stream.fields, "rrsets": rrsets})
+            self.responseCache.store(cacheKey, getRecords.headers, records)
+            return records
+        except ValueError as e:
+            # invalid json or rrsets
             logger.error(
                 "Hetzner Records Endpoint responded with invalid Response Body",
             )
             raise e
+        finally:
+            getRecords.release()
 
-    async def getCurrentDNSConfig(self):
-        api_token: str = self.config.provider_config.api_token
-        logger = Logger.getDNSUpdaterLogger()
+    async def __fetchZoneRecords(
+        self, zone: str, zoneId: str, apiTimeout: aiohttp.ClientTimeout
+    ) -> bool:
+        recordPages = await fetchAllPages(
+            fetchPage=lambda page: self.__getZoneRecordsPage(
+                zone, zoneId, page, apiTimeout
+            ),
+            lastPage=lambda page: page.meta.pagination.last_page,
+            nextPage=lambda page: page.meta.pagination.next_page,
+        )
+        if recordPages is None:
+            return False
+        self.runState.zone_records[zoneId] = {}
+        # the pages only hold the configured records
+        for records in recordPages:
+            for entry in records.rrsets:
+                self.runState.zone_records[zoneId][entry.type + "-" + entry.name] = entry
+        return True
 
+    async def getCurrentZoneConfig(self, zoneName: str, useCache: bool) -> bool:
         apiTimeout = aiohttp.ClientTimeout(total=10)
-        # TODO: pagination handling
-        getZones = await self.aioSession.get(
+        if not useCache or zoneName not in self.zone_ids:
+            zones = await self.__getZonesPage(1, apiTimeout, name=zoneName)
+            if zones is None:
+                return False
+            for entry in zones.zones:
+                self.zone_ids[entry.name] = str(entry.id)
+            if zoneName not in self.zone_ids:
+                Logger.getDNSUpdaterLogger().error(
+                    f"Get Hetzner Cloud Records for Zone {zoneName} failed: Zone not found in Hetzner Cloud Zones"
+                )
+                return False
+        return await self.__getZoneRecords(zoneName, apiTimeout, useCache)
+
+    async def __getZoneRecords(
+        self, zone: str, apiTimeout: aiohttp.ClientTimeout, useCache: bool
+    ) -> bool:
+        logger = Logger.getDNSUpdaterLogger()
+        try:
+            return await self.__fetchZoneRecords(zone, self.zone_ids[zone], apiTimeout)
+        except ZoneNotFoundError:
+            self.invalidateZoneId(zone)
+            if not useCache:
+                logger.error(
+                    f"Get Hetzner Cloud Records for Zone {zone} failed: Zone not found"
+                )
+                return False
+        # cached zone id is stale, resolve it again
+        logger.debug(f"Cached Hetzner Cloud Zone ID of {zone} is stale")
+        zones = await self.__getZonesPage(1, apiTimeout, name=zone)
+        if zones is None or len(zones.zones) == 0:
+            logger.error(
+                f"Get Hetzner Cloud Records for Zone {zone} failed: Zone not found in Hetzner Cloud Zones"
+            )
+            return False
+        self.zone_ids[zone] = str(zones.zones[0].id)
+        try:
+            return await self.__fetchZoneRecords(zone, self.zone_ids[zone], apiTimeout)
+        except ZoneNotFoundError:
+            logger.error(
+                f"Get Hetzner Cloud Records for Zone {zone} failed: Zone not found"
+            )
+            self.invalidateZoneId(zone)
+            return False
+
+    async def __getZonesPage(
+        self, page: int, apiTimeout: aiohttp.ClientTimeout, name: str | None = None
+    ) -> HetznerCloudZoneSummaries | None:
+        logger = Logger.getDNSUpdaterLogger()
+        params: dict[str, str | int] = {"page": page, "per_page": PER_PAGE}
+        if name is not None:
+            params["name"] = name
+        cacheKey = self.responseCache.key("https://api.hetzner.cloud/v1/zones", params)
+        getZones = await self.apiRequest(
+            "GET",
             url="https://api.hetzner.cloud/v1/zones",
             headers={
-                "Authorization": f"Bearer {api_token}",
+                "Authorization": f"Bearer {self.config.provider_config.api_token}",
+                **self.responseCache.conditionalHeaders(cacheKey),
             },
+            params=params,
             timeout=apiTimeout,
         )
+        if getZones.status == 304:
+            getZones.release()
+            cached = self.responseCache.get(cacheKey)
+            if cached is None:
+                logger.error("Get Hetzner Zones - Not Modified, but the response is no longer cached")
+                return None
+            return cached
 
         if getZones.status >= 400:
             match getZones.status:
                 case 400:
-                    logger.error(
-                        "Get Hetzner Zones - Pagination selectors are mutually exclusive"
+                    raise self.responseError(
+                        getZones, "Pagination selectors are mutually exclusive"
                     )
-                case 401:
-                    logger.error(f"Get Hetzner Zones - {getZones.reason}")
-                    return
-                case 406:
-                    logger.error(f"Get Hetzner Zones - {getZones.reason}")
-                    return
+                case 429:
+                    raise self.responseError(getZones, "Rate limit exceeded")
                 case _:
-                    logger.error(
-                        f"Get Hetzner Zones - Unknown Error Code {getZones.status}"
-                    )
-                    return
+                    raise self.responseError(getZones)
         try:
-            zones: HetznerCloudZones = HetznerCloudZones.model_validate(
-                await getZones.json()
-            )
-            for entry in zones.zones:
-                self.zone_records[str(entry.id)] = {}
-                self.zone_ids[entry.name] = str(entry.id)
+            # validate the raw body, no intermediate dicts of the whole listing
+            zones = HetznerCloudZoneSummaries.model_validate_json(await getZones.read())
+            self.responseCache.store(cacheKey, getZones.headers, zones)
+            return zones
         except ValidationError as e:
             logger.error(
                 f"Hetzner Zones Endpoint responded with invalid Response Body:\n```{(await getZones.text())}```",
             )
             raise e
 
+    async def probe(self) -> bool:
+        probeResponse = await self.apiRequest(
+            "GET",
+            url="https://api.hetzner.cloud/v1/zones",
+            retry=False,
+            headers={
+                "Authorization": f"Bearer {self.config.provider_config.api_token}",
+            },
+            params={"page": 1, "per_page": 1},
+            timeout=aiohttp.ClientTimeout(total=5),
+        )
+        probeResponse.release()
+        return probeResponse.status < 500 and probeResponse.status != 429
+
+    async def getCurrentDNSConfig(self) -> bool:
+        logger = Logger.getDNSUpdaterLogger()
+
+        apiTimeout = aiohttp.ClientTimeout(total=10)
+        success = True
+        useCache = self.hasCachedZoneIds()
+        if not useCache:
+            self.zone_ids = {}
+            if self.useTargetedFetch():
+                # look up the configured zones by name instead of listing the whole account
+                zoneLookups = await asyncio.gather(
+                    *[
+                        self.__getZonesPage(1, apiTimeout, name=zone.name)
+                        for zone in self.config.zones
+                    ],
+                    return_exceptions=False,
+                )
+                success = all(zones is not None for zones in zoneLookups)
+                zonePages = [zones for zones in zoneLookups if zones is not None]
+            else:
+                zonePages = await fetchAllPages(
+                    fetchPage=lambda page: self.__getZonesPage(page, apiTimeout),
+                    lastPage=lambda page: page.meta.pagination.last_page,
+                    nextPage=lambda page: page.meta.pagination.next_page,
+                )
+                if zonePages is None:
+                    return False
+            for zones in zonePages:
+                for entry in zones.zones:
+                    self.zone_ids[entry.name] = str(entry.id)
+            if success:
+                self.cacheZoneIds()
+
         # query zone records in parallel
-        zone_record_fetch_tasks: list[CoroutineType] = []
+        zone_record_fetch_tasks: list[CoroutineType[Any, Any, bool]] = []
         for zone in self.config.zones:
             if not zone.name in self.zone_ids:
                 logger.error(
                     f"Get Hetzner Cloud Records for Zone {zone.name} failed: Zone not found in Hetzner Cloud Zones"
                 )
+                success = False
                 continue
-            zone_record_fetch_tasks.append(self.__getZoneRecords(zone.name, apiTimeout))
-        await asyncio.gather(*zone_record_fetch_tasks, return_exceptions=False)
-
-    def createDNSRecord(self, type: str, name: str, value: str, zoneName: str):
-        if not self.zone_ids[zoneName] in self.created_zone_records:
-            self.created_zone_records[self.zone_ids[zoneName]] = {}
-        self.created_zone_records[self.zone_ids[zoneName]][f"{type}-{name}"] = (
-            CreateHetznerCloudRRSet(
-                name=name,
-                type=type,
-                ttl=self.globalConfig.ttl,
-                records=[
-                    HetznerCloudRRSetRecord(
-                        value=value, comment="Managed by DNS Updater"
-                    )
-                ],
+            zone_record_fetch_tasks.append(
+                self.__getZoneRecords(zone.name, apiTimeout, useCache)
             )
-        )
+        results = await asyncio.gather(*zone_record_fetch_tasks, return_exceptions=False)
+        return success and all(results)
 
-    def updateDNSRecord(self, type: str, name: str, value: str, zoneName: str):
-        temp_record = self.zone_records[self.zone_ids[zoneName]][f"{type}-{name}"]
+    def recordState(
+        self, record: HetznerCloudRRSet
+    ) -> tuple[tuple[str, ...], int | None]:
+        return tuple(entry.value for entry in record.records), record.ttl
 
-        if (
-            temp_record.records
-            == [HetznerCloudRRSetRecord(value=value, comment="Managed by DNS Updater")]
-            and temp_record.ttl == self.globalConfig.ttl
-        ):
-            # skip if record value is unchanged
-            return False
+    def createDNSRecord(self, zoneName: str, change: RecordChange):
+        if not self.zone_ids[zoneName] in self.runState.created_zone_records:
+            self.runState.created_zone_records[self.zone_ids[zoneName]] = {}
+        self.runState.created_zone_records[self.zone_ids[zoneName]][
+            f"{change.type}-{change.name}"
+        ] = CreateHetznerCloudRRSet(
+            name=change.name,
+            type=change.type,
+            ttl=change.ttl,
+            records=[
+                HetznerCloudRRSetRecord(value=value, comment="Managed by DNS Updater")
+                for value in change.values
+            ],
+        )
 
-        temp_record.records = [
-            HetznerCloudRRSetRecord(value=value, comment="Managed by DNS Updater")
-        ]
-        temp_record.ttl = self.globalConfig.ttl
-        if not self.zone_ids[zoneName] in self.updated_zone_records:
-            self.updated_zone_records[self.zone_ids[zoneName]] = {}
-        self.updated_zone_records[self.zone_ids[zoneName]][
-            f"{type}-{name}"
+    def updateDNSRecord(self, zoneName: str, change: RecordChange):
+        update: dict[str, Any] = {"ttl": change.ttl}
+        if change.action == "update":
+            # one record per active IPv6 prefix
+            update["records"] = [
+                HetznerCloudRRSetRecord(value=value, comment="Managed by DNS Updater")
+                for value in change.values
+            ]
+        # keep the fetched rrset untouched, it is compared against when pushing the update
+        temp_record = self.runState.zone_records[self.zone_ids[zoneName]][
+            f"{change.type}-{change.name}"
+        ].model_copy(update=update)
+        if not self.zone_ids[zoneName] in self.runState.updated_zone_records:
+            self.runState.updated_zone_records[self.zone_ids[zoneName]] = {}
+        self.runState.updated_zone_records[self.zone_ids[zoneName]][
+            f"{change.type}-{change.name}"
         ] = temp_record
 
     async def createDNSRecordAPI(
@@ -164,7 +334,8 @@ class AsyncHetznerCloudProvider(AsyncProvider):
         apiTimeout: aiohttp.ClientTimeout,
     ) -> tuple[str, str | None]:
         zone_encoded = quote(zone)
-        createResponse = await self.aioSession.post(
+        createResponse = await self.apiRequest(
+            "POST",
             url=f"https://api.hetzner.cloud/v1/zones/{zone_encoded}/rrsets",
             headers={
                 "Content-Type": "application/json",
@@ -188,6 +359,8 @@ class AsyncHetznerCloudProvider(AsyncProvider):
                     return "", f"Create Hetzner Records Error - {createResponse.reason}"
                 case 422:
                     return "", "Create Hetzner Records Error - Unprocessable entity"
+                case 429:
+                    return "", "Create Hetzner Records Error - Rate limit exceeded"
                 case _:
                     return "", f"Undefined Error Code: {createResponse.status}"
         else:
@@ -199,8 +372,10 @@ class AsyncHetznerCloudProvider(AsyncProvider):
     ) -> tuple[str, str | None]:
         name_encoded = quote(record.name)
         type_encoded = quote(record.type.upper())
-        updateTTLResponse = await self.aioSession.post(
+        updateTTLResponse = await self.apiRequest(
+            "POST",
             url=f"https://api.hetzner.cloud/v1/zones/{record.zone}/rrsets/{name_encoded}/{type_encoded}/actions/change_ttl",
+            idempotent=True,  # sets absolute values
             headers={
                 "Content-Type": "application/json",
                 "Authorization": f"Bearer {self.config.provider_config.api_token}",
@@ -238,6 +413,8 @@ class AsyncHetznerCloudProvider(AsyncProvider):
                     )
                 case 422:
                     return "", "Update Hetzner Records TTL Error - Unprocessable entity"
+                case 429:
+                    return "", "Update Hetzner Records TTL Error - Rate limit exceeded"
                 case _:
                     return (
                         "",
@@ -265,8 +442,10 @@ class AsyncHetznerCloudProvider(AsyncProvider):
     ) -> tuple[str, str | None]:
         name_encoded = quote(record.name)
         type_encoded = quote(record.type.upper())
-        updateValuesResponse = await self.aioSession.post(
+        updateValuesResponse = await self.apiRequest(
+            "POST",
             url=f"https://api.hetzner.cloud/v1/zones/{record.zone}/rrsets/{name_encoded}/{type_encoded}/actions/set_records",
+            idempotent=True,  # sets absolute values
             headers={
                 "Content-Type": "application/json",
                 "Authorization": f"Bearer {self.config.provider_config.api_token}",
@@ -307,6 +486,11 @@ class AsyncHetznerCloudProvider(AsyncProvider):
                         "",
                         "Update Hetzner Records Values Error - Unprocessable entity",
                     )
+                case 429:
+                    return (
+                        "",
+                        "Update Hetzner Records Values Error - Rate limit exceeded",
+                    )
                 case _:
                     return (
                         "",
@@ -329,41 +513,257 @@ class AsyncHetznerCloudProvider(AsyncProvider):
             else:
                 return "", f"Update Hetzner Records Values Error - {response["error"]}"
 
-    async def updateDNSConfig(self):
+    async def __exportZonefile(
+        self, zone_encoded: str, headers: dict[str, str], apiTimeout: aiohttp.ClientTimeout
+    ) -> tuple[str, str | None]:
+        # returns the zone file or an error
+        getZonefileResponse = await self.apiRequest(
+            "GET",
+            url=f"https://api.hetzner.cloud/v1/zones/{zone_encoded}/zonefile",
+            headers=headers,
+            timeout=apiTimeout,
+        )
+        if getZonefileResponse.status >= 400:
+            getZonefileResponse.release()
+            match getZonefileResponse.status:
+                case 429:
+                    return "", "Export Hetzner Zonefile Error - Rate limit exceeded"
+                case _:
+                    return (
+                        "",
+                        f"Export Hetzner Zonefile Error - {getZonefileResponse.status} {getZonefileResponse.reason}",
+                    )
+        return (await getZonefileResponse.json())["zonefile"], None
+
+    async def __waitForAction(
+        self, action: HetznerCloudAction, headers: dict[str, str], apiTimeout: aiohttp.ClientTimeout
+    ) -> str | None:
+        # returns an error unless the action finished successfully
+        deadline = asyncio.get_running_loop().time() + ACTION_TIMEOUT
+        while action.status == "running":
+            if asyncio.get_running_loop().time() >= deadline:
+                return f"Hetzner Action {action.command} {action.id} still running after {ACTION_TIMEOUT}s"
+            await asyncio.sleep(ACTION_POLL_INTERVAL)
+            actionResponse = await self.apiRequest(
+                "GET",
+                url=f"https://api.hetzner.cloud/v1/actions/{action.id}",
+                headers=headers,
+                timeout=apiTimeout,
+            )
+            if actionResponse.status >= 400:
+                actionResponse.release()
+                return f"Get Hetzner Action {action.id} Error - {actionResponse.status} {actionResponse.reason}"
+            try:
+                action = HetznerCloudActionResponse.model_validate_json(await actionResponse.read()).action
+            except ValidationError:
+                return f"Get Hetzner Action {action.id} Error - invalid Response Body: {await actionResponse.text()}"
+        if action.status == "error":
+            reason = "unknown error" if action.error is None else f"{action.error.code}: {action.error.message}"
+            return f"Hetzner Action {action.command} {action.id} failed - {reason}"
+        return None
+
+    async def importZoneRRSetsAPI(
+        self,
+        zone: str,
+        rrsets: list[HetznerCloudRRSet | CreateHetznerCloudRRSet],
+        apiTimeout: aiohttp.ClientTimeout,
+    ) -> tuple[str, str | None] | None:
+        """Apply `rrsets` with one zone file import, None if they have to be applied one by one instead.
+
+        The import replaces the whole zone, a zone file that can not be rewritten safely or that changed
+        while it was rewritten is not imported, so records edited in the meantime are never reverted."""
+        logger = Logger.getDNSUpdaterLogger()
+        zone_encoded = quote(zone)
+        headers = {
+            "Authorization": f"Bearer {self.config.provider_config.api_token}",
+        }
+        exported, error = await self.__exportZonefile(zone_encoded, headers, apiTimeout)
+        if error is not None:
+            return "", error
+        zoneName = next(
+            name for name, zone_id in self.zone_ids.items() if zone_id == zone
+        )
+        try:
+            zonefile = replaceRRSets(
+                zonefile=exported,
+                zoneName=zoneName,
+                rrsets=rrsets,
+            )
+        except ZonefileParseError as e:
+            logger.debug(f"Zone file of {zoneName} can not be rewritten ({e}), updating its rrsets one by one")
+            return None
+        # export again right before the import, a lost concurrent edit would go unnoticed otherwise
+        recheck, error = await self.__exportZonefile(zone_encoded, headers, apiTimeout)
+        if error is not None:
+            return "", error
+        if recheck != exported:
+            logger.debug(f"Zone {zoneName} changed during its zone file import, updating its rrsets one by one")
+            return None
+
+        importResponse = await self.apiRequest(
+            "POST",
+            url=f"https://api.hetzner.cloud/v1/zones/{zone_encoded}/actions/import_zonefile",
+            idempotent=False,  # a resent import would replay the zone file over later edits
+            headers={"Content-Type": "application/json", **headers},
+            data=json.dumps({"zonefile": zonefile}),
+            timeout=apiTimeout,
+        )
+        if importResponse.status >= 400:
+            match importResponse.status:
+                case 422:
+                    return (
+                        "",
+                        f"Import Hetzner Zonefile Error - Unprocessable entity: {await importResponse.text()}",
+                    )
+                case 429:
+                    importResponse.release()
+                    return "", "Import Hetzner Zonefile Error - Rate limit exceeded"
+                case _:
+                    importResponse.release()
+                    return (
+                        "",
+                        f"Import Hetzner Zonefile Error - {importResponse.status} {importResponse.reason}",
+                    )
+        try:
+            action = HetznerCloudActionResponse.model_validate_json(await importResponse.read()).action
+        except ValidationError:
+            return "", f"Import Hetzner Zonefile Error - invalid Response Body: {await importResponse.text()}"
+        # the import is applied asynchronously, only its finished action tells whether it succeeded
+        error = await self.__waitForAction(action, headers, apiTimeout)
+        if error is not None:
+            return "", f"Import Hetzner Zonefile Error - {error}"
+        return (
+            json.dumps(
+                {
+                    "zone": zoneName,
+                    "rrsets": [
+                        {
+                            "type": rrset.type,
+                            "name": rrset.name,
+                            "ttl": rrset.ttl,
+                            "values": [record.value for record in rrset.records],
+                        }
+                        for rrset in rrsets
+                    ],
+                }
+            ),
+            None,
+        )
+
+    async def updateDNSConfig(self) -> bool:
+        return await self.__pushRecords(
+            updated_zone_records=self.runState.updated_zone_records,
+            created_zone_records=self.runState.created_zone_records,
+        )
+
+    async def updateZoneConfig(self, zoneName: str) -> bool:
+        zoneId = self.zone_ids[zoneName]
+        return await self.__pushRecords(
+            updated_zone_records={
+                zoneId: self.runState.updated_zone_records.get(zoneId, {})
+            },
+            created_zone_records={
+                zoneId: self.runState.created_zone_records.get(zoneId, {})
+            },
+        )
+
+    async def __pushRecords(
+        self,
+        updated_zone_records: dict[str, dict[str, HetznerCloudRRSet]],
+        created_zone_records: dict[str, dict[str, CreateHetznerCloudRRSet]],
+    ) -> bool:
         logger = Logger.getDNSUpdaterLogger()
         globalConfig = self.globalConfig
 
         apiTimeout = aiohttp.ClientTimeout(total=10)
+        all_applied = True
+
+        threshold = self.config.provider_config.zonefile_import_threshold
+        import_zone_ids = [
+            zone_id
+            for zone_id in {*updated_zone_records, *created_zone_records}
+            if threshold > 0
+            and len(updated_zone_records.get(zone_id, {}))
+            + len(created_zone_records.get(zone_id, {}))
+            >= threshold
+        ]
+        if not globalConfig.dry_run and len(import_zone_ids) > 0:
+            # large change sets are applied with a single zone file import per zone
+            results = await asyncio.gather(
+                *[
+                    self.importZoneRRSetsAPI(
+                        zone=zone_id,
+                        rrsets=[
+                            *updated_zone_records.get(zone_id, {}).values(),
+                            *created_zone_records.get(zone_id, {}).values(),
+                        ],
+                        apiTimeout=apiTimeout,
+                    )
+                    for zone_id in import_zone_ids
+                ],
+                return_exceptions=False,
+            )
+            error_list: list[str] = []
+            success_list: list[str] = []
+            for zone_id, result in zip(list(import_zone_ids), results):
+                if result is None:
+                    # not imported, updated one by one below
+                    import_zone_ids.remove(zone_id)
+                    continue
+                success, error = result
+                if error is not None:
+                    error_list.append(error)
+                else:
+                    success_list.append(success)
+            if len(error_list) > 0:
+                all_applied = False
+                logger.error("\n".join(error_list))
+            if len(success_list) > 0:
+                logger.info(
+                    "These Records were imported:\n```%s```",
+                    "\n".join(success_list),
+                    extra=self.logFields(action="import"),
+                )
+            updated_zone_records = {
+                zone_id: zone
+                for zone_id, zone in updated_zone_records.items()
+                if zone_id not in import_zone_ids
+            }
+            created_zone_records = {
+                zone_id: zone
+                for zone_id, zone in created_zone_records.items()
+                if zone_id not in import_zone_ids
+            }
 
-        updated_zone_records = [
+        updated_records = [
             record
-            for zone in self.updated_zone_records.values()
+            for zone in updated_zone_records.values()
             for record in zone.values()
         ]
         if globalConfig.dry_run:
             logger.info(
-                f"These Records would be updated:\n```{json.dumps(
-                    [record.model_dump() for record in updated_zone_records]
-                )}```"
+                "These Records would be updated:\n```%s```",
+                LazyJSON(lambda: [record.model_dump() for record in updated_records]),
+                extra=self.logFields(
+                    action="update", record=self.recordNames(updated_records)
+                ),
             )
-        elif len(updated_zone_records) > 0:
+        elif len(updated_records) > 0:
             update_record_tasks: list[
                 CoroutineType[Any, Any, tuple[str, str | None]]
             ] = []
-            for zone_id, zone in self.updated_zone_records.items():
+            for zone_id, zone in updated_zone_records.items():
                 for record in zone.values():
-                    if record.ttl != self.globalConfig.ttl:
+                    current = self.runState.zone_records[zone_id][
+                        f"{record.type}-{record.name}"
+                    ]
+                    if record.ttl != current.ttl:
                         update_record_tasks.append(
                             self.updateDNSRecordTTLAPI(
                                 record=record, apiTimeout=apiTimeout
                             )
                         )
-                    if (
-                        record.records
-                        != self.zone_records[zone_id][
-                            f"{record.type}-{record.name}"
-                        ]
-                    ):
+                    if record.records != current.records:
                         update_record_tasks.append(
                             self.updateDNSRecordValuesAPI(
                                 record=record, apiTimeout=apiTimeout
@@ -382,26 +782,35 @@ class AsyncHetznerCloudProvider(AsyncProvider):
                 else:
                     success_list.append(success)
             if len(error_list) > 0:
+                all_applied = False
                 logger.error("\n".join(error_list))
             else:
                 logger.info(
-                    f"These Records were updated:\n```{"\n".join(success_list)}```"
+                    "These Records were updated:\n```%s```",
+                    "\n".join(success_list),
+                    extra=self.logFields(
+                        action="update", record=self.recordNames(updated_records)
+                    ),
                 )
 
-        created_zone_records = [
+        created_records = [
             record
-            for zone in self.created_zone_records.values()
+            for zone in created_zone_records.values()
             for record in zone.values()
         ]
         if globalConfig.dry_run:
             logger.info(
-                f"These Records would be created:\n```{json.dumps([record.model_dump() for record in created_zone_records])}```"
+                "These Records would be created:\n```%s```",
+                LazyJSON(lambda: [record.model_dump() for record in created_records]),
+                extra=self.logFields(
+                    action="create", record=self.recordNames(created_records)
+                ),
             )
-        elif len(created_zone_records) > 0:
+        elif len(created_records) > 0:
             create_record_tasks: list[
                 CoroutineType[Any, Any, tuple[str, str | None]]
             ] = []
-            for zone_id, zone in self.created_zone_records.items():
+            for zone_id, zone in created_zone_records.items():
                 for record in zone.values():
                     create_record_tasks.append(
                         self.createDNSRecordAPI(
@@ -421,8 +830,14 @@ class AsyncHetznerCloudProvider(AsyncProvider):
                 else:
                     success_list.append(success)
             if len(error_list) > 0:
+                all_applied = False
                 logger.error("\n".join(error_list))
             else:
                 logger.info(
-                    f"These Records were created:\n```{"\n".join(success_list)}```"
+                    "These Records were created:\n```%s```",
+                    "\n".join(success_list),
+                    extra=self.logFields(
+                        action="create", record=self.recordNames(created_records)
+                    ),
                 )
+        return all_applied
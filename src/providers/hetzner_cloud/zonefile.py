@@ -0,0 +1,131 @@
+from .api_pydantic_models import CreateHetznerCloudRRSet, HetznerCloudRRSet
+
+RECORD_CLASSES = {"IN", "CH", "HS"}
+
+
+class ZonefileParseError(ValueError):
+    """Raised for zone file lines whose records can not be identified safely, e.g. an unterminated quote."""
+
+
+def _tokenize(line: str) -> tuple[list[str], int]:
+    # tokens of a line and its change of the parentheses depth,
+    # quoted character strings (e.g. TXT data) may contain whitespace, ";" and parentheses
+    tokens: list[str] = []
+    token: list[str] = []
+    depth = 0
+    quoted = False
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if char == "\\":
+            # escaped character, taken literally inside and outside of quotes
+            token.append(line[i : i + 2])
+            i += 2
+            continue
+        if quoted:
+            token.append(char)
+            quoted = char != '"'
+        elif char == '"':
+            token.append(char)
+            quoted = True
+        elif char == ";":
+            break
+        elif char.isspace() or char in "()":
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            if len(token) > 0:
+                tokens.append("".join(token))
+                token = []
+        else:
+            token.append(char)
+        i += 1
+    if quoted:
+        raise ZonefileParseError(f"Unterminated quote in zone file line: {line}")
+    if len(token) > 0:
+        tokens.append("".join(token))
+    return tokens, depth
+
+
+def _ownerName(name: str, origin: str, zoneName: str) -> str:
+    # owner names as used by the rrsets endpoints, relative to the zone
+    if name == "@":
+        absolute = origin
+    elif name.endswith("."):
+        absolute = name.rstrip(".")
+    else:
+        absolute = f"{name}.{origin}"
+    if absolute == zoneName:
+        return "@"
+    if absolute.endswith("." + zoneName):
+        return absolute[: -len(zoneName) - 1]
+    return absolute + "."
+
+
+def _recordType(tokens: list[str]) -> str | None:
+    # owner [ttl] [class] type rdata, ttl and class may be swapped
+    for token in tokens[1:3]:
+        if not token.isdigit() and token.upper() not in RECORD_CLASSES:
+            return token.upper()
+    return tokens[3].upper() if len(tokens) > 3 else None
+
+
+def formatRRSet(rrset: HetznerCloudRRSet | CreateHetznerCloudRRSet) -> list[str]:
+    lines: list[str] = []
+    for record in rrset.records:
+        line = f"{rrset.name}\t{rrset.ttl}\tIN\t{rrset.type}\t{record.value}"
+        if record.comment:
+            line += f" ; {record.comment}"
+        lines.append(line)
+    return lines
+
+
+def replaceRRSets(
+    zonefile: str,
+    zoneName: str,
+    rrsets: list[HetznerCloudRRSet | CreateHetznerCloudRRSet],
+) -> str:
+    """Replace the records of `rrsets` in an exported zone file, keeping everything else untouched.
+
+    Raises ZonefileParseError if the zone file contains lines whose records can not be identified safely."""
+    replaced = {(rrset.name, rrset.type.upper()) for rrset in rrsets}
+    zoneName = zoneName.rstrip(".")
+    origin = zoneName
+    lines: list[str] = []
+    owner = "@"
+    parenthesesDepth = 0
+    skipping = False  # the current multi-line record is replaced
+    for line in zonefile.splitlines():
+        tokens, depth = _tokenize(line)
+        if parenthesesDepth > 0:
+            # continuation of a multi-line record, e.g. the SOA
+            parenthesesDepth += depth
+            if not skipping:
+                lines.append(line)
+            continue
+        parenthesesDepth += depth
+        if parenthesesDepth < 0:
+            raise ZonefileParseError(f"Unbalanced parentheses in zone file line: {line}")
+        if len(tokens) == 0 or tokens[0].startswith("$"):
+            if len(tokens) > 1 and tokens[0].upper() == "$ORIGIN":
+                origin = tokens[1].rstrip(".")
+            lines.append(line)
+            continue
+        if line[0].isspace():
+            # record without owner name belongs to the previous owner
+            tokens.insert(0, owner)
+        else:
+            owner = _ownerName(tokens[0], origin, zoneName)
+        skipping = (owner, _recordType(tokens)) in replaced
+        if skipping:
+            continue
+        lines.append(line)
+    if parenthesesDepth != 0:
+        raise ZonefileParseError("Unbalanced parentheses at the end of the zone file")
+    if origin != zoneName:
+        # the appended owner names are relative to the zone
+        lines.append(f"$ORIGIN {zoneName}.")
+    for rrset in rrsets:
+        lines.extend(formatRRSet(rrset))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,166 @@
+import codecs
+import json
+from typing import Any, AsyncIterator, Literal
+
+import aiohttp
+
+# bytes read from a response body at once
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = " \t\n\r"
+# characters which continue a number, a number followed only by these could be cut off at a chunk border
+NUMBER_CONTINUATION = ".eE+-"
+
+
+class JSONArrayStream(object):
+    """Incrementally decodes a JSON object, yielding the items of its `arrayKey` member as they arrive.
+
+    Only the undecoded rest of the body and the item currently decoded are held, so the memory used for a
+    large listing is bounded by the items kept by the caller. The other members of the object, e.g. the
+    pagination metadata, are decoded as a whole and available in `fields` once the body was consumed.
+    A body without the array is rejected, it must not be mistaken for an empty listing."""
+
+    arrayKey: str
+    fields: dict[str, Any]
+    _decoder: json.JSONDecoder
+    _text: codecs.IncrementalDecoder
+    _buffer: str
+    _pos: int
+    _state: Literal["start", "member", "value", "items", "done"]
+    _key: str | None  # key of the member whose value is decoded next
+    _separated: bool  # a member or item may follow, i.e. after "{", "[" or ","
+    _found: bool  # the array member was seen
+
+    def __init__(self, arrayKey: str):
+        self.arrayKey = arrayKey
+        self.fields = {}
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._key = None
+        self._separated = True
+        self._found = False
+
+    async def items(self, content: aiohttp.StreamReader) -> AsyncIterator[Any]:
+        async for chunk in content.iter_chunked(CHUNK_SIZE):
+            for item in self.feed(chunk):
+                yield item
+        for item in self.feed(b"", final=True):
+            yield item
+
+    def feed(self, data: bytes, final: bool = False) -> list[Any]:
+        """Decode the next chunk of the body, returns the array items completed by it."""
+        self._buffer = self._buffer[self._pos :] + self._text.decode(data, final)
+        self._pos = 0
+        items: list[Any] = []
+        while self.__step(items, final):
+            pass
+        if final and (self._state != "done" or self._buffer[self._pos :].strip(WHITESPACE)):
+            raise ValueError(f"Truncated or invalid JSON body at character {self._pos}")
+        if final and not self._found:
+            raise ValueError(f"JSON body has no {self.arrayKey} array")
+        return items
+
+    def __skipWhitespace(self) -> str | None:
+        # next significant character, None if more data is needed
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+            self._pos += 1
+        if self._pos == len(self._buffer):
+            return None
+        return self._buffer[self._pos]
+
+    def __decode(self, final: bool) -> tuple[Any, bool]:
+        # a value ending at the end of the buffer could be a truncated number, wait for its delimiter
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None, False
+        if end == len(self._buffer) and not final:
+            return None, False
+        if (
+            not final
+            and isinstance(value, (int, float))
+            and not isinstance(value, bool)
+            and all(char in NUMBER_CONTINUATION for char in self._buffer[end:])
+        ):
+            # e.g. "1." or "1e", the fraction or exponent follows with the next chunk
+            return None, False
+        self._pos = end
+        return value, True
+
+    def __separator(self, char: str, closing: str) -> bool:
+        # consume "," between members or items, returns False if the member or item is still missing
+        if char == closing or self._separated:
+            return True
+        if char != ",":
+            raise ValueError(f"Expected ',' or '{closing}' at character {self._pos}")
+        self._pos += 1
+        self._separated = True
+        return False
+
+    def __step(self, items: list[Any], final: bool) -> bool:
+        # advance by one token or value, returns False if more data is needed
+        char = self.__skipWhitespace()
+        if char is None or self._state == "done":
+            return False
+        match self._state:
+            case "start":
+                if char != "{":
+                    raise ValueError(f"Expected a JSON object at character {self._pos}")
+                self._pos += 1
+                self._state = "member"
+                self._separated = True
+            case "member":
+                if not self.__separator(char, "}"):
+                    return True
+                if char == "}":
+                    self._pos += 1
+                    self._state = "done"
+                    return True
+                start = self._pos
+                key, complete = self.__decode(final)
+                if not complete:
+                    return False
+                if not isinstance(key, str):
+                    raise ValueError(f"Expected a member name at character {self._pos}")
+                colon = self.__skipWhitespace()
+                if colon is None:
+                    # the name is decoded again with the next chunk
+                    self._pos = start
+                    return False
+                if colon != ":":
+                    raise ValueError(f"Expected ':' at character {self._pos}")
+                self._pos += 1
+                self._key = key
+                self._state = "value"
+            case "value":
+                if self._key == self.arrayKey and char == "[":
+                    self._pos += 1
+                    self._state = "items"
+                    self._separated = True
+                    self._found = True
+                    return True
+                value, complete = self.__decode(final)
+                if not complete:
+                    return False
+                self.fields[str(self._key)] = value
+                self._state = "member"
+                self._separated = False
+            case "items":
+                if not self.__separator(char, "]"):
+                    return True
+                if char == "]":
+                    self._pos += 1
+                    self._state = "member"
+                    self._separated = False
+                    return True
+                item, complete = self.__decode(final)
+                if not complete:
+                    return False
+                items.append(item)
+                self._separated = False
+        return True
@@ -0,0 +1,50 @@
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+Page = TypeVar("Page")
+
+DEFAULT_PAGE_CONCURRENCY = 4
+
+
+async def fetchAllPages(
+    fetchPage: Callable[[int], Awaitable[Page | None]],
+    lastPage: Callable[[Page], int | None],
+    nextPage: Callable[[Page], int | None],
+    maxConcurrency: int = DEFAULT_PAGE_CONCURRENCY,
+) -> list[Page] | None:
+    """Fetch the first page and, once it reveals the last page, all remaining pages concurrently.
+
+    Falls back to following `nextPage` sequentially if the API does not report the last page.
+    Returns None if any page could not be fetched, as partial listings would lead to duplicate records."""
+    firstPage = await fetchPage(1)
+    if firstPage is None:
+        return None
+    pages: list[Page] = [firstPage]
+
+    last = lastPage(firstPage)
+    if last is not None:
+        if last <= 1:
+            return pages
+        semaphore = asyncio.Semaphore(maxConcurrency)
+
+        async def boundedFetchPage(page: int) -> Page | None:
+            async with semaphore:
+                return await fetchPage(page)
+
+        remaining = await asyncio.gather(
+            *[boundedFetchPage(page) for page in range(2, last + 1)],
+            return_exceptions=False,
+        )
+        if any(page is None for page in remaining):
+            return None
+        pages.extend(remaining)
+        return pages
+
+    next = nextPage(firstPage)
+    while next is not None:
+        page = await fetchPage(next)
+        if page is None:
+            return None
+        pages.append(page)
+        next = nextPage(page)
+    return pages
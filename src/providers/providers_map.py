@@ -1,13 +1,25 @@
 import asyncio
+import time
 from typing import Type
 
-from config import Config
-from ip_fetching import getCurrentIPv4Address, getCurrentIPv6Prefix, ipFetchFails
+import aiohttp
+
+from config import Config, ZonesConfig
+from ip_fetching import (
+    getCurrentIPv4Address,
+    getCurrentIPv6Prefixes,
+    ipFetchFails,
+    IPDiscovery,
+    IPv6Prefix,
+    IPv6PrefixDiscovery,
+)
 from custom_logging import Logger
+from state_store import StateStore
 
 from .abstract import AsyncProvider
 from .hetzner import AsyncHetznerProvider
 from .hetzner_cloud import AsyncHetznerCloudProvider
+from .retry import secondsUntilNextRun
 
 
 providerMap: dict[str, Type[AsyncProvider]] = {
@@ -16,75 +28,303 @@ providerMap: dict[str, Type[AsyncProvider]] = {
 }
 
 
+# failures left after all retries of a request, counted towards the allowed consecutive timeouts
+PROVIDER_REQUEST_ERRORS = (asyncio.TimeoutError, aiohttp.ClientError)
+
+
+def failureReason(error: BaseException) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+        return "Timeout"
+    if isinstance(error, aiohttp.ClientConnectionError):
+        return "Connection Error"
+    if isinstance(error, aiohttp.ClientResponseError):
+        # error status left after all retries, e.g. a lasting 5xx outage
+        return f"HTTP {error.status} {error.message}"
+    return "Request Error"
+
+
+def logFetchFailure(provider: AsyncProvider, allowed_fails: int, reason: str):
+    logger = Logger.getDNSUpdaterLogger()
+    provider.consecutive_fail_counter.fetchFail += 1
+    if provider.consecutive_fail_counter.fetchFail > allowed_fails:
+        logger.error(
+            f"{type(provider).__name__} Zone {reason} fetching DNS Records {provider.consecutive_fail_counter.fetchFail} time(s) in a row",
+            extra={"alert": f"{provider.stateKey()}-fetch"},
+        )
+    else:
+        logger.debug(
+            f"{type(provider).__name__} Zone {reason} fetching DNS Records within allowed limit",
+        )
+
+
+def logUpdateFailure(provider: AsyncProvider, allowed_fails: int, reason: str):
+    logger = Logger.getDNSUpdaterLogger()
+    provider.consecutive_fail_counter.updateFail += 1
+    if provider.consecutive_fail_counter.updateFail > allowed_fails:
+        logger.error(
+            f"{type(provider).__name__} Zone {reason} updating DNS Records {provider.consecutive_fail_counter.updateFail} time(s) in a row",
+            extra={"alert": f"{provider.stateKey()}-update"},
+        )
+    else:
+        logger.debug(
+            f"{type(provider).__name__} Zone {reason} updating DNS Records within allowed limit",
+        )
+
+
+def resetFetchFailures(provider: AsyncProvider, allowed_fails: int):
+    if provider.consecutive_fail_counter.fetchFail > allowed_fails:
+        # only after the failures were reported
+        Logger.getDNSUpdaterLogger().info(
+            f"{type(provider).__name__} fetching DNS Records recovered",
+            extra={"resolves": f"{provider.stateKey()}-fetch"},
+        )
+    provider.consecutive_fail_counter.fetchFail = 0
+
+
+def resetUpdateFailures(provider: AsyncProvider, allowed_fails: int):
+    if provider.consecutive_fail_counter.updateFail > allowed_fails:
+        Logger.getDNSUpdaterLogger().info(
+            f"{type(provider).__name__} updating DNS Records recovered",
+            extra={"resolves": f"{provider.stateKey()}-update"},
+        )
+    provider.consecutive_fail_counter.updateFail = 0
+
+
+async def zonePipelineFetchAndUpdate(
+    config: Config,
+    provider: AsyncProvider,
+    ipv4Address: str | None,
+    ipv6Prefixes: tuple[IPv6Prefix, ...] | None,
+) -> tuple[bool | None, bool | None]:
+    # returns (fetched, applied), None if a request of a phase failed
+    allowed_fails = (
+        provider.config.allowed_consecutive_timeouts
+        or config.global_.allowed_consecutive_provider_timeouts
+    )
+    useCache = provider.hasCachedZoneIds()
+    if not useCache:
+        provider.zone_ids = {}
+    semaphore = asyncio.Semaphore(max(1, provider.config.zone_concurrency))
+    fetchFailures: list[str] = []
+    updateFailures: list[str] = []
+
+    async def processZone(zone: ZonesConfig) -> tuple[bool, bool]:
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                fetched = await provider.getCurrentZoneConfig(zone.name, useCache)
+            except PROVIDER_REQUEST_ERRORS as e:
+                fetchFailures.append(failureReason(e))
+                return False, False
+            if not fetched:
+                return False, False
+            provider.updateZoneRecordsLocally(
+                zone=zone,
+                currentIPv4=ipv4Address,
+                currentIPv6Prefixes=ipv6Prefixes,
+            )
+            try:
+                applied = await provider.updateZoneConfig(zone.name)
+            except PROVIDER_REQUEST_ERRORS as e:
+                updateFailures.append(failureReason(e))
+                return True, False
+            duration = time.monotonic() - start
+            Logger.getDNSUpdaterLogger().debug(
+                "%s Zone %s synced in %.3fs",
+                type(provider).__name__,
+                zone.name,
+                duration,
+                extra=provider.logFields(zone=zone.name, action="sync", duration=duration),
+            )
+            return True, applied
+
+    try:
+        # an unexpected error, e.g. an invalid response body, cancels the other zones, so no zone keeps
+        # pushing updates into the run state after the run ended
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(processZone(zone)) for zone in provider.config.zones]
+    except ExceptionGroup as e:
+        # surface it like in bulk mode
+        raise e.exceptions[0] from None
+    results = [task.result() for task in tasks]
+    fetched = all(result[0] for result in results)
+    applied = all(result[1] for result in results)
+    if not useCache and fetched:
+        provider.cacheZoneIds()
+
+    # counters are only reset by a successful phase, a zone that was not found is neither
+    if len(fetchFailures) > 0:
+        logFetchFailure(provider, allowed_fails, fetchFailures[0])
+    elif fetched:
+        resetFetchFailures(provider, allowed_fails)
+    if len(updateFailures) > 0:
+        logUpdateFailure(provider, allowed_fails, updateFailures[0])
+    elif len(fetchFailures) == 0 and fetched and applied:
+        resetUpdateFailures(provider, allowed_fails)
+    if len(fetchFailures) > 0 or len(updateFailures) > 0:
+        return None, None
+    return fetched, applied
+
+
 async def providerFetchAndUpdate(
     config: Config,
     provider: AsyncProvider,
     ipv4Address: str | None,
-    ipv6Address: list[str] | None,
+    ipv6Prefixes: tuple[IPv6Prefix, ...] | None,
+    stateStore: StateStore,
 ):
     logger = Logger.getDNSUpdaterLogger()
     allowed_fails = (
         provider.config.allowed_consecutive_timeouts
         or config.global_.allowed_consecutive_provider_timeouts
     )
-    # clear attributes before loop iteration
-    provider.updated_zone_records = {}
-    provider.created_zone_records = {}
-    provider.zone_ids = {}
-    provider.zone_records = {}
-    try:
-        await provider.getCurrentDNSConfig()
-        provider.consecutive_fail_counter.fetchFail = 0
-    except asyncio.TimeoutError as e:
-        provider.consecutive_fail_counter.fetchFail += 1
-        if provider.consecutive_fail_counter.fetchFail > allowed_fails:
-            logger.error(
-                f"{type(provider).__name__} Zone Timeout fetching DNS Records {provider.consecutive_fail_counter.fetchFail} time(s) in a row",
-            )
-        else:
+    providerState = stateStore.getProviderState(provider.stateKey())
+    if providerState.isUpToDate(
+        ipv4=ipv4Address,
+        ipv6_prefixes=ipv6Prefixes,
+        now=time.time(),
+        full_reconcile_interval=config.global_.full_reconcile_interval,
+    ):
+        logger.debug(
+            "%s IP unchanged since last update, skipping provider API calls",
+            type(provider).__name__,
+            extra=provider.logFields(action="skip"),
+        )
+        return
+    if provider.config.circuit_breaker.enabled:
+        if not provider.circuitBreaker.allowRun():
             logger.debug(
-                f"{type(provider).__name__} Zone Timeout fetching DNS Records within allowed limit",
+                "%s circuit open, skipping provider API calls",
+                type(provider).__name__,
+                extra=provider.logFields(action="skip"),
             )
-        return
-    provider.updateDNSRecordsLocally(
-        currentIPv4=ipv4Address,
-        currentIPv6Prefix=ipv6Address,
+            return
+        if provider.circuitBreaker.state == "half-open":
+            try:
+                available = await provider.probe()
+            except PROVIDER_REQUEST_ERRORS:
+                available = False
+            if not available:
+                provider.circuitBreaker.probeFailed()
+                return
+    start = time.monotonic()
+    retryDeadline = provider.config.retry.deadline or secondsUntilNextRun(
+        provider.config.cron or config.global_.cron
     )
-    try:
-        await provider.updateDNSConfig()
-        provider.consecutive_fail_counter.updateFail = 0
-    except asyncio.TimeoutError as e:
-        provider.consecutive_fail_counter.updateFail += 1
-        if provider.consecutive_fail_counter.updateFail > allowed_fails:
-            logger.error(
-                f"{type(provider).__name__} Zone Timeout updating DNS Records {provider.consecutive_fail_counter.updateFail} time(s) in a row",
+    provider.retry_deadline = (
+        time.monotonic() + retryDeadline if retryDeadline is not None else None
+    )
+    # clear the snapshot and change set of the previous run, zone_ids are cached by the provider
+    provider.runState.reset()
+    if providerState.zone_ids_expiry > provider.zone_ids_expiry:
+        # zone ids persisted by a previous run
+        provider.zone_ids = dict(providerState.zone_ids)
+        provider.zone_ids_expiry = providerState.zone_ids_expiry
+    if provider.useTargetedFetch():
+        # pipeline every zone through fetch, diff and update, so a slow zone does not hold back the others
+        fetched, applied = await zonePipelineFetchAndUpdate(
+            config=config,
+            provider=provider,
+            ipv4Address=ipv4Address,
+            ipv6Prefixes=ipv6Prefixes,
+        )
+        providerState.zone_ids = dict(provider.zone_ids)
+        providerState.zone_ids_expiry = provider.zone_ids_expiry
+        if fetched is None or applied is None:
+            return
+    else:
+        try:
+            fetched = await provider.getCurrentDNSConfig()
+        except PROVIDER_REQUEST_ERRORS as e:
+            logFetchFailure(provider, allowed_fails, failureReason(e))
+            return
+        finally:
+            providerState.zone_ids = dict(provider.zone_ids)
+            providerState.zone_ids_expiry = provider.zone_ids_expiry
+        if fetched:
+            resetFetchFailures(provider, allowed_fails)
+        provider.updateDNSRecordsLocally(
+            currentIPv4=ipv4Address,
+            currentIPv6Prefixes=ipv6Prefixes,
+        )
+        try:
+            applied = await provider.updateDNSConfig()
+        except PROVIDER_REQUEST_ERRORS as e:
+            logUpdateFailure(provider, allowed_fails, failureReason(e))
+            return
+        if fetched and applied:
+            resetUpdateFailures(provider, allowed_fails)
+    duration = time.monotonic() - start
+    logger.debug(
+        "%s run finished in %.3fs",
+        type(provider).__name__,
+        duration,
+        extra=provider.logFields(action="run", duration=duration),
+    )
+    if fetched and applied and not config.global_.dry_run:
+        # remember what was pushed, so the next ticks with an unchanged IP can be skipped
+        providerState.ipv4 = ipv4Address
+        providerState.ipv6_prefixes = ipv6Prefixes
+        providerState.last_reconcile = time.time()
+
+
+async def skipIPFetch() -> None:
+    return None
+
+
+async def discoverAddresses(
+    config: Config,
+    consecutive_ip_fails: ipFetchFails,
+    ipv4Discovery: IPDiscovery,
+    ipv6PrefixDiscoveries: list[IPv6PrefixDiscovery],
+) -> tuple[str | None, tuple[IPv6Prefix, ...] | None]:
+    # fetch both address families concurrently, so the tick only waits for the slower one
+    return await asyncio.gather(
+        (
+            skipIPFetch()
+            if config.global_.disable_v4
+            else getCurrentIPv4Address(
+                globalConfig=config.global_,
+                consecutive_ip_fails=consecutive_ip_fails,
+                ipDiscovery=ipv4Discovery,
             )
-        else:
-            logger.debug(
-                f"{type(provider).__name__} Zone Timeout updating DNS Records within allowed limit",
+        ),
+        (
+            skipIPFetch()
+            if config.global_.disable_v6
+            else getCurrentIPv6Prefixes(
+                config=config,
+                consecutive_ip_fails=consecutive_ip_fails,
+                prefixDiscoveries=ipv6PrefixDiscoveries,
             )
+        ),
+    )
 
 
-async def run_all_providers(
-    providers: list[AsyncProvider], config: Config, consecutive_ip_fails: ipFetchFails
+async def runProvider(
+    config: Config,
+    provider: AsyncProvider,
+    ipv4Address: str | None,
+    ipv6Prefixes: tuple[IPv6Prefix, ...] | None,
+    stateStore: StateStore,
 ):
-    ipv4Address = getCurrentIPv4Address(
-        globalConfig=config.global_, consecutive_ip_fails=consecutive_ip_fails
-    )
-    ipv6Address = getCurrentIPv6Prefix(
-        config=config, consecutive_ip_fails=consecutive_ip_fails
-    )
-
-    if ipv4Address is not None or ipv6Address is not None:
-        # schedule all providers in parallel as tasks
-        tasks = [
-            providerFetchAndUpdate(
-                config=config,
-                ipv4Address=ipv4Address,
-                ipv6Address=ipv6Address,
-                provider=provider,
+    if ipv4Address is None and ipv6Prefixes is None:
+        return
+    try:
+        await providerFetchAndUpdate(
+            config=config,
+            ipv4Address=ipv4Address,
+            ipv6Prefixes=ipv6Prefixes,
+            provider=provider,
+            stateStore=stateStore,
+        )
+    finally:
+        # also after unexpected errors, e.g. an invalid response body, so the outcome counted so far is kept
+        if provider.config.circuit_breaker.enabled:
+            provider.circuitBreaker.update(
+                max(
+                    provider.consecutive_fail_counter.fetchFail,
+                    provider.consecutive_fail_counter.updateFail,
+                )
             )
-            for provider in providers
-        ]
-        # wait for all to complete (gather returns their results or raises if one fails)
-        await asyncio.gather(*tasks, return_exceptions=False)
+        stateStore.save()
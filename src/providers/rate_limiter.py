@@ -0,0 +1,133 @@
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping
+
+from config import RateLimitConfig
+from custom_logging import Logger
+
+# requests left untouched in the provider quota, so other clients of the same token are not starved
+QUOTA_RESERVE = 1
+# RateLimit-Reset values above this are unix timestamps instead of seconds from now
+RESET_TIMESTAMP_THRESHOLD = 1_000_000_000
+# lowest adapted request rate per second, so a nearly exhausted quota does not stall the provider for hours
+MIN_RATE = 0.05
+
+
+def parseRetryAfter(value: str | None, now: float) -> float | None:
+    """Seconds to wait according to a `Retry-After` header, which holds either seconds or an HTTP date."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter(object):
+    """Token bucket combined with a concurrency limit, shared by all requests of one provider.
+
+    The configured rate is an upper bound, `RateLimit-*` response headers lower it as the quota runs low
+    and `Retry-After` pauses all requests."""
+
+    config: RateLimitConfig
+    rate: float  # tokens per second
+    tokens: float
+    updated: float
+    blocked_until: float
+
+    def __init__(self, config: RateLimitConfig):
+        self.config = config
+        self.rate = config.requests_per_second
+        self.tokens = float(config.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self._semaphore = asyncio.Semaphore(config.max_concurrent_requests)
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(
+            float(self.config.burst), self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    async def _takeToken(self):
+        # the lock hands out tokens in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if self.blocked_until > now:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            await self._takeToken()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, *args):
+        self._semaphore.release()
+
+    def observe(self, status: int, headers: Mapping[str, str]):
+        """Adapt to the quota reported by the provider in a response."""
+        now = time.monotonic()
+        self._refill(now)
+        wallclock = time.time()
+
+        if status == 429:
+            retryAfter = parseRetryAfter(headers.get("Retry-After"), wallclock)
+            if retryAfter is None:
+                retryAfter = self.config.default_retry_after
+            self.blocked_until = max(self.blocked_until, now + retryAfter)
+            self.tokens = 0
+            Logger.getDNSUpdaterLogger().debug(
+                f"Provider rate limit exceeded, pausing requests for {retryAfter:.1f}s"
+            )
+            return
+
+        try:
+            remaining = int(headers["RateLimit-Remaining"])
+        except (KeyError, ValueError):
+            # provider does not report its quota, keep the configured rate
+            return
+        reset = None
+        try:
+            reset = float(headers["RateLimit-Reset"])
+            if reset > RESET_TIMESTAMP_THRESHOLD:
+                reset -= wallclock
+            reset = max(reset, 1.0)
+        except (KeyError, ValueError):
+            pass
+
+        usable = remaining - QUOTA_RESERVE
+        self.tokens = min(self.tokens, max(float(usable), 0.0))
+        if reset is None:
+            return
+        refill = 0
+        try:
+            # the quota refills continuously until it is full again at RateLimit-Reset
+            refill = max(int(headers["RateLimit-Limit"]) - remaining, 0)
+        except (KeyError, ValueError):
+            pass
+        if usable <= 0:
+            # quota used up, wait until the provider hands out the next request
+            wait = reset / refill if refill > 0 else reset
+            self.blocked_until = max(self.blocked_until, now + wait)
+            return
+        # spread the quota until the reset, but never exceed the configured rate
+        self.rate = max(
+            min(self.config.requests_per_second, (usable + refill) / reset), MIN_RATE
+        )
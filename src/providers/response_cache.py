@@ -0,0 +1,69 @@
+from typing import Any, Mapping, NamedTuple, Sequence
+
+# cached listings per provider, the least recently used are dropped beyond this
+MAX_ENTRIES = 1000
+
+
+class CachedResponse(NamedTuple):
+    etag: str | None
+    last_modified: str | None
+    value: Any  # the parsed body, returned again if the server reports it unchanged
+
+
+class ResponseCache(object):
+    """Validators and parsed bodies of GET responses, to revalidate them with conditional requests.
+
+    A listing fetched before is requested with `If-None-Match` / `If-Modified-Since`. If the server answers
+    `304 Not Modified` the previously parsed value is reused, so neither the body is transferred nor parsed
+    and validated again. Cached values are shared between runs and must not be modified."""
+
+    enabled: bool
+    entries: dict[str, CachedResponse]  # dict[request key, response], in least recently used order
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.entries = {}
+
+    @staticmethod
+    def key(
+        url: str,
+        params: Mapping[str, Any] | Sequence[tuple[str, Any]] | None = None,
+        variant: str = "",
+    ) -> str:
+        # `variant` covers anything else the parsed value depends on, e.g. filters applied while parsing
+        items = params.items() if isinstance(params, Mapping) else params or []
+        return f"{url}?{"&".join(f"{name}={value}" for name, value in items)}#{variant}"
+
+    def conditionalHeaders(self, key: str) -> dict[str, str]:
+        cached = self.entries.get(key) if self.enabled else None
+        if cached is None:
+            return {}
+        headers: dict[str, str] = {}
+        if cached.etag is not None:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified is not None:
+            headers["If-Modified-Since"] = cached.last_modified
+        return headers
+
+    def get(self, key: str) -> Any:
+        cached = self.entries.pop(key, None)
+        if cached is None:
+            return None
+        self.entries[key] = cached
+        return cached.value
+
+    def store(self, key: str, headers: Mapping[str, str], value: Any):
+        """Cache `value` parsed from a response, if the response carries validators."""
+        if not self.enabled:
+            return
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        self.entries.pop(key, None)
+        if etag is None and last_modified is None:
+            return
+        self.entries[key] = CachedResponse(etag, last_modified, value)
+        while len(self.entries) > MAX_ENTRIES:
+            del self.entries[next(iter(self.entries))]
+
+    def clear(self):
+        self.entries.clear()
@@ -0,0 +1,27 @@
+import random
+from datetime import datetime, timedelta
+
+from cronsim import CronSim, CronSimError
+
+from config import RetryConfig
+
+# methods that can be sent again without side effects if the first response got lost
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE"}
+# server side failures that are usually gone a few seconds later
+RETRYABLE_STATUS = {500, 502, 503, 504}
+
+
+def backoffDelay(attempt: int, config: RetryConfig) -> float:
+    """Exponential backoff with full jitter, so concurrent requests don't retry in lockstep."""
+    return random.uniform(0, min(config.max_delay, config.base_delay * 2 ** (attempt - 1)))
+
+
+def secondsUntilNextRun(cron: str) -> float | None:
+    # retries should be given up before the next cron run starts over anyway
+    try:
+        now = datetime.now().astimezone()
+        # skip the tick this run may have been started by slightly early
+        nextRun = next(CronSim(cron, now + timedelta(seconds=1)))
+        return (nextRun - now).total_seconds()
+    except (CronSimError, StopIteration):
+        return None
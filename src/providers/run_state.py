@@ -0,0 +1,29 @@
+from typing import Generic, TypeVar
+
+FetchedRecord = TypeVar("FetchedRecord")
+UpdatedRecord = TypeVar("UpdatedRecord")
+CreatedRecord = TypeVar("CreatedRecord")
+
+
+class RunState(Generic[FetchedRecord, UpdatedRecord, CreatedRecord]):
+    """Fetched snapshot and change set of the current run of one provider instance.
+
+    Owned by the provider instance, so several instances of the same provider class (e.g. two accounts)
+    never share records. Allocated once and cleared in place at the start of every run."""
+
+    zone_records: dict[str, dict[str, FetchedRecord]]  # dict[zone_id, dict[type-record_name, fetched record]]
+    updated_zone_records: dict[str, dict[str, UpdatedRecord]]  # dict[zone_id, dict[key, record]]
+    created_zone_records: dict[str, dict[str, CreatedRecord]]  # dict[zone_id, dict[key, record]]
+    deleted_zone_records: dict[str, dict[str, UpdatedRecord]]  # surplus records of providers holding one record per value
+
+    def __init__(self):
+        self.zone_records = {}
+        self.updated_zone_records = {}
+        self.created_zone_records = {}
+        self.deleted_zone_records = {}
+
+    def reset(self):
+        self.zone_records.clear()
+        self.updated_zone_records.clear()
+        self.created_zone_records.clear()
+        self.deleted_zone_records.clear()
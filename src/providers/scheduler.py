@@ -0,0 +1,162 @@
+import asyncio
+from pydantic import BaseModel
+
+import aiocron
+
+from config import Config
+from custom_logging import Logger
+from ip_fetching import IPDiscovery, IPv6Prefix, IPv6PrefixDiscovery, ipFetchFails
+from state_store import StateStore
+
+from .abstract import AsyncProvider
+from .providers_map import discoverAddresses, runProvider
+
+
+class ScheduleStats(BaseModel):
+    runs: int = 0
+    overlapped: int = 0  # ticks due while the previous run was still in progress
+    skipped: int = 0  # overlapped ticks coalesced into an already pending run
+
+
+class ProviderSchedule(object):
+    provider: AsyncProvider
+    cron: str
+    stats: ScheduleStats
+    task: asyncio.Task | None
+    pending: bool  # a tick was due during the current run, run once more afterwards
+
+    def __init__(self, provider: AsyncProvider, cron: str):
+        self.provider = provider
+        self.cron = cron
+        self.stats = ScheduleStats()
+        self.task = None
+        self.pending = False
+
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+
+class ProviderScheduler(object):
+    """Runs every provider on its own cron with at most one run per provider in flight.
+
+    A tick of a provider which is still running is not started concurrently, instead one more run
+    follows the current one, further ticks in the meantime are coalesced into it. Providers due at the
+    same time share one address discovery."""
+
+    config: Config
+    consecutive_ip_fails: ipFetchFails
+    stateStore: StateStore
+    ipv4Discovery: IPDiscovery
+    ipv6PrefixDiscoveries: list[IPv6PrefixDiscovery]
+    schedules: list[ProviderSchedule]
+    crons: list[aiocron.Cron]
+    _discovery: asyncio.Task | None
+
+    def __init__(
+        self,
+        providers: list[AsyncProvider],
+        config: Config,
+        consecutive_ip_fails: ipFetchFails,
+        stateStore: StateStore,
+        ipv4Discovery: IPDiscovery,
+        ipv6PrefixDiscoveries: list[IPv6PrefixDiscovery],
+    ):
+        self.config = config
+        self.consecutive_ip_fails = consecutive_ip_fails
+        self.stateStore = stateStore
+        self.ipv4Discovery = ipv4Discovery
+        self.ipv6PrefixDiscoveries = ipv6PrefixDiscoveries
+        self.schedules = [
+            ProviderSchedule(provider, provider.config.cron or config.global_.cron)
+            for provider in providers
+        ]
+        self.crons = []
+        self._discovery = None
+        self.stateStore.prune([provider.stateKey() for provider in providers])
+
+    def start(self):
+        crons: dict[str, list[ProviderSchedule]] = {}
+        for schedule in self.schedules:
+            crons.setdefault(schedule.cron, []).append(schedule)
+        for cron, schedules in crons.items():
+            self.crons.append(
+                aiocron.crontab(
+                    cron,
+                    func=lambda schedules=schedules: self.tick(schedules),
+                    start=True,
+                )
+            )
+
+    def stop(self):
+        for cron in self.crons:
+            cron.stop()
+        self.crons = []
+
+    def stats(self) -> dict[str, ScheduleStats]:
+        return {schedule.provider.stateKey(): schedule.stats for schedule in self.schedules}
+
+    def tick(self, schedules: list[ProviderSchedule]):
+        for schedule in schedules:
+            self.__request(schedule)
+
+    async def runAll(self):
+        """Run all providers now, e.g. after an address change, and wait for them."""
+        self.tick(self.schedules)
+        await asyncio.gather(
+            *[schedule.task for schedule in self.schedules if schedule.task is not None],
+            return_exceptions=True,
+        )
+
+    def __request(self, schedule: ProviderSchedule):
+        if schedule.running():
+            schedule.stats.overlapped += 1
+            if schedule.pending:
+                schedule.stats.skipped += 1
+            schedule.pending = True
+            Logger.getDNSUpdaterLogger().debug(
+                "%s run still in progress, running again afterwards (%d ticks overlapped, %d skipped so far)",
+                type(schedule.provider).__name__,
+                schedule.stats.overlapped,
+                schedule.stats.skipped,
+                extra=schedule.provider.logFields(action="skip"),
+            )
+            return
+        schedule.task = asyncio.create_task(self.__run(schedule))
+        schedule.task.add_done_callback(
+            lambda task, schedule=schedule: self.__onRunDone(schedule, task)
+        )
+
+    async def __addresses(self) -> tuple[str | None, tuple[IPv6Prefix, ...] | None]:
+        # providers due at the same time wait for the same discovery
+        if self._discovery is None or self._discovery.done():
+            self._discovery = asyncio.create_task(
+                discoverAddresses(
+                    config=self.config,
+                    consecutive_ip_fails=self.consecutive_ip_fails,
+                    ipv4Discovery=self.ipv4Discovery,
+                    ipv6PrefixDiscoveries=self.ipv6PrefixDiscoveries,
+                )
+            )
+        return await asyncio.shield(self._discovery)
+
+    async def __run(self, schedule: ProviderSchedule):
+        while True:
+            schedule.pending = False
+            schedule.stats.runs += 1
+            ipv4Address, ipv6Prefixes = await self.__addresses()
+            await runProvider(
+                config=self.config,
+                provider=schedule.provider,
+                ipv4Address=ipv4Address,
+                ipv6Prefixes=ipv6Prefixes,
+                stateStore=self.stateStore,
+            )
+            if not schedule.pending:
+                return
+
+    def __onRunDone(self, schedule: ProviderSchedule, task: asyncio.Task):
+        schedule.pending = False
+        if not task.cancelled() and task.exception() is not None:
+            Logger.getDNSUpdaterLogger().error(
+                f"{type(schedule.provider).__name__} run failed: {task.exception()!r}"
+            )
@@ -0,0 +1,2 @@
+from .state_models import ProviderState, State
+from .state_store import StateStore
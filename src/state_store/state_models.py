@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+
+from ip_fetching import IPv6Prefix
+
+
+class ProviderState(BaseModel):
+    ipv4: str | None = None
+    ipv6_prefixes: tuple[IPv6Prefix, ...] | None = None  # all active delegated prefixes
+    last_reconcile: float = 0  # unix timestamp of the last successful full fetch & update
+    zone_ids: dict[str, str] = {}  # dict[zone_name, zone_id]
+    zone_ids_expiry: float = 0  # unix timestamp until which zone_ids may be reused
+
+    def isUpToDate(
+        self,
+        ipv4: str | None,
+        ipv6_prefixes: tuple[IPv6Prefix, ...] | None,
+        now: float,
+        full_reconcile_interval: int,
+    ) -> bool:
+        if full_reconcile_interval <= 0 or self.last_reconcile <= 0:
+            return False
+        if now - self.last_reconcile >= full_reconcile_interval:
+            # force periodic full reconcile to catch out-of-band edits
+            return False
+        return self.ipv4 == ipv4 and self.ipv6_prefixes == ipv6_prefixes
+
+
+class State(BaseModel):
+    providers: dict[str, ProviderState] = {}  # dict[provider state key, ProviderState]
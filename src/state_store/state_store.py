@@ -0,0 +1,58 @@
+import os
+import tempfile
+from pydantic import ValidationError
+
+from custom_logging import Logger
+
+from .state_models import ProviderState, State
+
+
+class StateStore(object):
+    """Last applied state per provider, optionally persisted to disk to survive restarts."""
+
+    state_file: str | None
+    state: State
+
+    def __init__(self, state_file: str | None = None):
+        self.state_file = state_file
+        self.state = self.load()
+
+    def load(self) -> State:
+        if self.state_file is None or not os.path.isfile(self.state_file):
+            return State()
+        try:
+            with open(self.state_file, "r") as file:
+                return State.model_validate_json(file.read())
+        except (OSError, ValidationError) as e:
+            # a broken state file only costs one full reconcile, never abort on it
+            Logger.getDNSUpdaterLogger().warning(
+                f"Ignoring unreadable state file {self.state_file}: {e}"
+            )
+            return State()
+
+    def getProviderState(self, key: str) -> ProviderState:
+        if key not in self.state.providers:
+            self.state.providers[key] = ProviderState()
+        return self.state.providers[key]
+
+    def prune(self, keys: list[str]):
+        # drop state of providers which are no longer configured
+        self.state.providers = {
+            key: value for key, value in self.state.providers.items() if key in keys
+        }
+
+    def save(self):
+        if self.state_file is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.state_file))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # write to a temporary file first, so a crash never leaves a truncated state file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".dns_updater_state")
+            with os.fdopen(fd, "w") as file:
+                file.write(self.state.model_dump_json())
+            os.replace(tmp_path, self.state_file)
+        except OSError as e:
+            Logger.getDNSUpdaterLogger().error(
+                f"Unable to write state file {self.state_file}: {e}"
+            )